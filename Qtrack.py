@@ -1,10 +1,11 @@
 import sys
 import cv2
 import numpy as np
-from PyQt5.QtWidgets import QApplication, QMainWindow, QLabel, QVBoxLayout, QPushButton, QSlider, QWidget, QFileDialog, QFrame, QDialog
+from PyQt5.QtWidgets import QApplication, QMainWindow, QLabel, QVBoxLayout, QPushButton, QSlider, QWidget, QFileDialog, QFrame, QDialog, QComboBox
 from PyQt5.QtCore import Qt, QTimer, QRect
 from PyQt5.QtGui import QImage, QPixmap, QPainter
 from datetime import timedelta
+from decoder import open_capture
 
 class VideoPlayer(QMainWindow):
     def __init__(self):
@@ -54,6 +55,11 @@ class VideoPlayer(QMainWindow):
         self.clear_button.clicked.connect(self.clear_trace)
         self.control_layout.addWidget(self.clear_button)
 
+        # 解碼器後端（auto 依副檔名決定），每個檔案載入時套用
+        self.decoder_combo = QComboBox(self)
+        self.decoder_combo.addItems(["auto", "opencv", "pyav", "ffmpeg"])
+        self.control_layout.addWidget(self.decoder_combo)
+
         # 進度條
         self.progress_slider = QSlider(Qt.Horizontal, self)
         self.progress_slider.sliderMoved.connect(self.on_progress_move)
@@ -81,6 +87,7 @@ class VideoPlayer(QMainWindow):
         # 影片屬性
         self.vid = None
         self.video_source = None
+        self.decoder_backend = None
         self.current_frame = 0
         self.total_frames = 0
         self.fps = 0
@@ -115,7 +122,9 @@ class VideoPlayer(QMainWindow):
         if self.vid:
             self.vid.release()
         self.video_source = video_source
-        self.vid = cv2.VideoCapture(self.video_source)
+        backend = self.decoder_combo.currentText()
+        self.decoder_backend = None if backend == "auto" else backend
+        self.vid = open_capture(self.video_source, self.decoder_backend)
         self.current_frame = 0
         self.total_frames = int(self.vid.get(cv2.CAP_PROP_FRAME_COUNT))
         self.fps = self.vid.get(cv2.CAP_PROP_FPS)
@@ -153,7 +162,7 @@ class VideoPlayer(QMainWindow):
     # 影片播放功能
     def play_video(self):
         if self.vid and not self.vid.isOpened():
-            self.vid = cv2.VideoCapture(self.video_source)
+            self.vid = open_capture(self.video_source, self.decoder_backend)
             self.vid.set(cv2.CAP_PROP_POS_FRAMES, self.current_frame)
         if self.roi and self.roi[2] and self.roi[3]:
             self.tracker = cv2.TrackerCSRT_create()
@@ -0,0 +1,237 @@
+# batch_track.py
+# 批次處理大量影片：把資料夾中的影片（或清單檔列出的影片）分配到行程池，每個行程用 headless_track 追蹤一部影片
+# 行程數預設為核心數，每個行程限制 OpenCV 與解碼的執行緒數，避免所有行程同時開滿執行緒互相搶用核心
+# 失敗的影片（例外、讓行程當掉的損壞檔案或超過 --timeout 的影片）會各自在獨立的行程中重試，不影響其他影片；
+# 指定 --timeout 時每部影片改用自己的行程執行，超過時間只結束卡住的那個行程；最後寫出整批的處理速度報告
+#     python batch_track.py 資料夾或清單檔 --output-dir 輸出資料夾 (--detect-class person | --roi x,y,w,h) [--workers 8]
+# 清單檔每一行為一部影片的路徑，後面可以接這部影片自己的初始 ROI（x,y,w,h，可以有多個），# 開頭的行會被忽略
+import argparse
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import cv2
+
+from detector import Detector, INPUT_SIZES
+from headless_track import track_video, write_tracks, parse_roi
+from tracker_registry import TRACKER_FACTORIES, TRACKING_RESOLUTIONS, DEFAULT_TRACKER
+from track_store import track_path
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".flv", ".wmv")
+OUTPUT_FORMATS = ("npy", "csv", "json", "tracks")
+
+_worker_threads = 1  # 每個行程可以使用的執行緒數，由 _init_worker 設定
+_worker_detector = None  # 每個行程自己的偵測器，第一次需要時才載入
+
+
+# 讀取資料夾中的所有影片，或清單檔中的 [(影片路徑, ROI 列表或 None), ...]
+def load_jobs(source, rois=None):
+    if os.path.isdir(source):
+        return [(os.path.join(source, name), rois) for name in sorted(os.listdir(source))
+                if name.lower().endswith(VIDEO_EXTENSIONS)]
+    jobs = []
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, encoding="utf-8") as f:
+        for line in f:
+            fields = line.split()
+            if not fields or fields[0].startswith("#"):
+                continue
+            path = fields[0] if os.path.isabs(fields[0]) else os.path.join(base, fields[0])
+            jobs.append((path, [parse_roi(field) for field in fields[1:]] or rois))
+    return jobs
+
+
+# 輸出檔名：影片檔名（含副檔名，a.mp4 與 a.avi 不會互相覆寫）加上 .tracks 與輸出格式
+def output_name(video_path, output_format):
+    name = os.path.basename(video_path)
+    if output_format == "tracks":
+        # 與播放器讀取的檔名相同（影片檔名加上 .tracks），放到影片旁邊就可以直接播放
+        return track_path(name)
+    return f"{name}.tracks.{output_format}"
+
+
+# 行程池中每個行程啟動時呼叫：限制 OpenCV 內部的執行緒數
+def _init_worker(threads):
+    global _worker_threads
+    _worker_threads = threads
+    cv2.setNumThreads(threads)
+
+
+# 在行程中追蹤一部影片並寫出結果，回傳統計資料
+def _process_video(video_path, rois, options):
+    global _worker_detector
+    if options["detect_class"] is not None and _worker_detector is None:
+        _worker_detector = Detector(input_size=options["size"])
+    tracks, stats = track_video(video_path, rois, options["detect_class"], options["tracker"], options["resolution"],
+                                max_targets=options["max_targets"], detector=_worker_detector, threads=_worker_threads)
+    write_tracks(os.path.join(options["output_dir"], output_name(video_path, options["format"])), tracks, video_path)
+    stats.pop("trackers")
+    return stats
+
+
+# 以行程池處理 jobs，結果與錯誤訊息分別記錄到 results、errors（影片路徑 -> 統計資料 / 最後一次的錯誤），回傳失敗的 jobs
+def _run_pool(jobs, options, workers, threads, results, errors):
+    failed = []
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(threads,)) as pool:
+        futures = {pool.submit(_process_video, path, rois, options): (path, rois) for path, rois in jobs}
+        for future in as_completed(futures):
+            path, rois = futures[future]
+            try:
+                results[path] = future.result()
+                errors.pop(path, None)
+                print(f"Done: {results[path]}")
+            except BrokenProcessPool:
+                # 某個行程當掉時，同一個行程池中還沒完成的影片都會失敗，無法知道是哪一部造成的，全部重試
+                errors[path] = "worker process crashed"
+                failed.append((path, rois))
+            except Exception as e:
+                errors[path] = f"{type(e).__name__}: {e}"
+                failed.append((path, rois))
+    return failed
+
+
+# 在自己的行程中處理一部影片，把 (是否成功, 統計資料或錯誤訊息) 送回主行程
+def _process_in_child(connection, video_path, rois, options, threads):
+    _init_worker(threads)
+    try:
+        connection.send((True, _process_video(video_path, rois, options)))
+    except Exception as e:
+        connection.send((False, f"{type(e).__name__}: {e}"))
+    finally:
+        connection.close()
+
+
+# 與 _run_pool 相同，但每部影片在自己的行程中處理（同時最多 workers 個），超過 timeout 秒的影片只結束它自己的行程
+# 每個行程只處理一部影片，偵測器不能在影片之間共用
+def _run_processes(jobs, options, workers, threads, results, errors, timeout):
+    failed = []
+    queue = list(jobs)
+    running = {}  # 行程 -> (影片路徑, ROI, 接收結果的 Connection, 開始的時間)
+    while queue or running:
+        while queue and len(running) < workers:
+            path, rois = queue.pop(0)
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=_process_in_child, args=(sender, path, rois, options, threads),
+                                              daemon=True)
+            process.start()
+            sender.close()
+            running[process] = (path, rois, receiver, time.perf_counter())
+        multiprocessing.connection.wait([job[2] for job in running.values()], timeout=1.0)
+        now = time.perf_counter()
+        for process, (path, rois, receiver, start) in list(running.items()):
+            if receiver.poll():
+                try:
+                    succeeded, value = receiver.recv()
+                except EOFError:
+                    # 行程沒有送出結果就結束了（例如損壞的檔案讓解碼器當掉）
+                    succeeded, value = False, "worker process crashed"
+            elif now - start > timeout:
+                process.terminate()
+                succeeded, value = False, f"timed out after {timeout} s"
+            else:
+                continue
+            process.join()
+            receiver.close()
+            del running[process]
+            if succeeded:
+                results[path] = value
+                errors.pop(path, None)
+                print(f"Done: {value}")
+            else:
+                errors[path] = value
+                failed.append((path, rois))
+    return failed
+
+
+def run_batch(jobs, options, workers=None, threads=None, retries=1, timeout=None):
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs) or 1))
+    threads = threads or max(1, (os.cpu_count() or 1) // workers)
+    results, errors = {}, {}
+
+    # 有 timeout 時每部影片使用自己的行程，才能只結束卡住的那一個
+    def run(batch, processes):
+        if timeout:
+            return _run_processes(batch, options, processes, threads, results, errors, timeout)
+        return _run_pool(batch, options, processes, threads, results, errors)
+
+    start = time.perf_counter()
+    failed = run(jobs, workers)
+    # 重試時每部影片使用自己的行程池，損壞的檔案就算讓行程當掉也只影響它自己
+    for _ in range(retries):
+        if not failed:
+            break
+        retry, failed = failed, []
+        for job in retry:
+            print(f"Retrying {job[0]} ({errors[job[0]]})")
+            failed += run([job], 1)
+    elapsed = time.perf_counter() - start
+    frames = sum(stats["frames"] for stats in results.values())
+    report = {
+        "videos": len(jobs),
+        "succeeded": len(results),
+        "failed": len(errors),
+        "workers": workers,
+        "threads_per_worker": threads,
+        "frames": frames,
+        "seconds": round(elapsed, 3),
+        "fps": round(frames / elapsed, 2) if elapsed else 0.0,
+        "results": results,
+        "errors": errors,
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Track objects in many videos with a process pool")
+    parser.add_argument("source", help="directory of videos or a manifest file")
+    parser.add_argument("--output-dir", required=True)
+    targets = parser.add_mutually_exclusive_group()
+    targets.add_argument("--roi", type=parse_roi, action="append", help="initial box x,y,w,h for every video")
+    targets.add_argument("--detect-class", help="detect targets of this class (name or id) on the first frame")
+    parser.add_argument("--max-targets", type=int, default=None)
+    parser.add_argument("--tracker", default=DEFAULT_TRACKER, choices=list(TRACKER_FACTORIES))
+    parser.add_argument("--resolution", default=TRACKING_RESOLUTIONS[0], choices=TRACKING_RESOLUTIONS)
+    parser.add_argument("--size", type=int, default=416, choices=INPUT_SIZES, help="detector input size")
+    parser.add_argument("--format", default="npy", choices=OUTPUT_FORMATS)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: core count)")
+    parser.add_argument("--threads", type=int, default=None, help="OpenCV threads per process")
+    parser.add_argument("--retries", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=None, help="seconds per video before it is treated as failed")
+    args = parser.parse_args()
+
+    jobs = load_jobs(args.source, args.roi)
+    if not jobs:
+        parser.error(f"no videos found in {args.source}")
+    # 清單檔中不同資料夾的同名影片會寫到同一個輸出檔
+    names = {}
+    for path, _ in jobs:
+        names.setdefault(output_name(path, args.format), []).append(path)
+    collisions = [paths for paths in names.values() if len(paths) > 1]
+    if collisions:
+        parser.error("videos with the same output name: " + "; ".join(", ".join(paths) for paths in collisions))
+    if args.detect_class is None and any(rois is None for _, rois in jobs):
+        parser.error("every video needs an ROI (--roi or in the manifest) unless --detect-class is given")
+    os.makedirs(args.output_dir, exist_ok=True)
+    options = {
+        "output_dir": args.output_dir,
+        "detect_class": args.detect_class,
+        "max_targets": args.max_targets,
+        "tracker": args.tracker,
+        "resolution": args.resolution,
+        "size": args.size,
+        "format": args.format,
+    }
+    report = run_batch(jobs, options, args.workers, args.threads, args.retries, args.timeout)
+    with open(os.path.join(args.output_dir, "report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    for path, error in report["errors"].items():
+        print(f"Failed: {path}: {error}")
+    print(f"Batch: {({k: v for k, v in report.items() if k not in ('results', 'errors')})}")
+
+
+if __name__ == "__main__":
+    main()
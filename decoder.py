@@ -0,0 +1,349 @@
+# decoder.py
+# 可替換的解碼器後端：OpenCV、PyAV、ffmpeg 子行程管線（rawvideo）
+# 每個後端都提供與 cv2.VideoCapture 相同的介面（read / grab / retrieve / get / set / isOpened / release），
+# 所以播放器、FrameReader、SeekIndex 等原本針對 VideoCapture 寫的程式碼不需要修改
+# 另外每個後端都有 set_output_size((寬, 高))，讓解碼器直接輸出顯示大小的幀；None 表示原始解析度
+import json
+import os
+import shutil
+import subprocess
+
+import cv2
+import numpy as np
+
+BACKEND_OPENCV = "opencv"
+BACKEND_PYAV = "pyav"
+BACKEND_FFMPEG = "ffmpeg"
+
+# 依副檔名指定偏好的後端（可依實際測試結果修改），沒有列出的副檔名使用 DEFAULT_BACKEND
+# Matroska / WebM 在 VideoCapture 中的幀數與跳轉不準確，改用以時間戳記跳轉的 PyAV；
+# FLV / WMV 交給 ffmpeg 子行程（OpenCV 的建置不一定包含這些格式）
+BACKEND_BY_EXTENSION = {
+    ".mkv": BACKEND_PYAV,
+    ".webm": BACKEND_PYAV,
+    ".flv": BACKEND_FFMPEG,
+    ".wmv": BACKEND_FFMPEG,
+}
+DEFAULT_BACKEND = BACKEND_OPENCV
+
+
+# 把原始大小 (寬, 高) 等比例縮小到可以放進 view_size 的大小；不需要縮小時回傳 None（使用原始解析度）
+def fit_size(frame_size, view_size):
+    frame_width, frame_height = frame_size
+    view_width, view_height = view_size
+    if frame_width <= 0 or frame_height <= 0 or view_width <= 1 or view_height <= 1:
+        return None
+    scale = min(view_width / frame_width, view_height / frame_height)
+    if scale >= 1:
+        return None
+    return max(1, int(frame_width * scale)), max(1, int(frame_height * scale))
+
+
+# OpenCV 後端：包裝 cv2.VideoCapture，可指定解碼執行緒數
+# VideoCapture 沒辦法在解碼時縮小，設定輸出大小後是在 retrieve 時（解碼執行緒中）用 INTER_AREA 縮小
+class OpenCVCapture:
+    def __init__(self, video_source, threads=0):
+        if threads and hasattr(cv2, "CAP_PROP_N_THREADS"):
+            self._vid = cv2.VideoCapture(video_source, cv2.CAP_ANY, [cv2.CAP_PROP_N_THREADS, threads])
+        else:
+            self._vid = cv2.VideoCapture(video_source)
+        self.output_size = None
+
+    def set_output_size(self, size):
+        self.output_size = size
+
+    def isOpened(self):
+        return self._vid.isOpened()
+
+    def grab(self):
+        return self._vid.grab()
+
+    def retrieve(self):
+        ret, frame = self._vid.retrieve()
+        if ret and self.output_size and (frame.shape[1], frame.shape[0]) != self.output_size:
+            frame = cv2.resize(frame, self.output_size, interpolation=cv2.INTER_AREA)
+        return ret, frame
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def get(self, prop):
+        return self._vid.get(prop)
+
+    def set(self, prop, value):
+        return self._vid.set(prop, value)
+
+    def release(self):
+        self._vid.release()
+
+
+# PyAV 後端：可以控制解碼執行緒，輸出直接轉成 BGR
+# 設定輸出大小時，縮小和 YUV -> BGR 轉換在 swscale 中一次完成，不會產生原始解析度的 BGR 影像
+class PyAVCapture:
+    def __init__(self, video_source, threads=0):
+        import av
+        self._container = av.open(video_source)
+        self._stream = self._container.streams.video[0]
+        self._stream.thread_type = "AUTO"  # 同時使用 frame 與 slice 多執行緒解碼
+        if threads:
+            self._stream.codec_context.thread_count = threads
+        self._time_base = float(self._stream.time_base)
+        self._start_pts = self._stream.start_time or 0
+        self._fps = float(self._stream.average_rate or self._stream.guessed_rate or 30)
+        frame_count = self._stream.frames
+        if not frame_count and self._stream.duration:
+            frame_count = int(self._stream.duration * self._time_base * self._fps)
+        self._frame_count = frame_count
+        self._frames = None  # 解碼產生器，跳轉後重新建立
+        self._peek = None  # 跳轉時多解碼出來、下一次 grab 要回傳的幀
+        self._current = None  # grab 取得、等待 retrieve 的幀
+        self._position = 0  # 下一次 read 會讀到的幀號
+        self._msec = 0.0
+        self._opened = True
+        self.output_size = None
+
+    def set_output_size(self, size):
+        self.output_size = size
+
+    def isOpened(self):
+        return self._opened
+
+    def _next_frame(self):
+        if self._peek is not None:
+            frame, self._peek = self._peek, None
+            return frame
+        if self._frames is None:
+            self._frames = self._container.decode(self._stream)
+        return next(self._frames, None)
+
+    def _frame_index(self, frame):
+        seconds = (frame.pts - self._start_pts) * self._time_base
+        return int(round(seconds * self._fps)), seconds
+
+    def grab(self):
+        if not self._opened:
+            return False
+        frame = self._next_frame()
+        if frame is None:
+            self._current = None
+            return False
+        self._current = frame
+        index, seconds = self._frame_index(frame) if frame.pts is not None else (self._position, self._msec / 1000)
+        self._position = index + 1
+        self._msec = seconds * 1000.0
+        return True
+
+    def retrieve(self):
+        if self._current is None:
+            return False, None
+        if self.output_size:
+            width, height = self.output_size
+            return True, self._current.to_ndarray(format="bgr24", width=width, height=height, interpolation="AREA")
+        return True, self._current.to_ndarray(format="bgr24")
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    # 跳到指定幀之前的關鍵幀，再往後解碼到目標幀
+    def _seek_frame(self, frame_index):
+        target_pts = self._start_pts + int(frame_index / self._fps / self._time_base)
+        self._container.seek(target_pts, stream=self._stream, backward=True)
+        self._frames = None
+        self._peek = None
+        half_frame = 0.5 / self._fps / self._time_base
+        while True:
+            frame = self._next_frame()
+            if frame is None:
+                break
+            if frame.pts is None or frame.pts >= target_pts - half_frame:
+                self._peek = frame
+                break
+        self._position = frame_index
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self._fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self._frame_count)
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self._stream.codec_context.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self._stream.codec_context.height)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self._position)
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return self._msec
+        return 0.0
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self._seek_frame(max(0, int(value)))
+            return True
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            self._seek_frame(max(0, int(value / 1000.0 * self._fps)))
+            return True
+        return False
+
+    def release(self):
+        if self._opened:
+            self._container.close()
+            self._opened = False
+
+
+# ffmpeg 子行程後端：ffmpeg 把解碼好的 BGR 原始資料寫到 stdout，這裡逐幀讀取
+# 跳轉時以 -ss 重新啟動子行程（放在 -i 之前，ffmpeg 會從關鍵幀精確解碼到目標時間）
+# 設定輸出大小時在 ffmpeg 內以 -vf scale 縮小，管線中傳輸的資料量也跟著變少
+class FFmpegPipeCapture:
+    def __init__(self, video_source, threads=0):
+        self._ffmpeg = shutil.which("ffmpeg")
+        ffprobe = shutil.which("ffprobe")
+        if self._ffmpeg is None or ffprobe is None:
+            raise OSError("ffmpeg / ffprobe not found in PATH")
+        self._video_source = video_source
+        self._threads = threads
+        info = json.loads(subprocess.run(
+            [ffprobe, "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "stream=width,height,avg_frame_rate,r_frame_rate,nb_frames,duration",
+             "-of", "json", video_source],
+            capture_output=True, text=True, check=True).stdout)
+        # 沒有影像串流或 ffprobe 沒有回報大小時改用其他後端（open_capture 處理 ValueError）
+        try:
+            info = info["streams"][0]
+            self._width = int(info["width"])
+            self._height = int(info["height"])
+        except (LookupError, TypeError) as e:
+            raise ValueError(f"no video stream size from ffprobe: {video_source}") from e
+        self._fps = _parse_rate(info.get("avg_frame_rate")) or _parse_rate(info.get("r_frame_rate")) or 30.0
+        frame_count = info.get("nb_frames")
+        if frame_count in (None, "N/A") and info.get("duration") not in (None, "N/A"):
+            frame_count = float(info["duration"]) * self._fps
+        self._frame_count = int(frame_count or 0)
+        self._process = None
+        self._current = None
+        self._position = 0
+        self.output_size = None
+        self._start(0)
+
+    # 改變輸出大小需要從目前位置重新啟動 ffmpeg
+    def set_output_size(self, size):
+        if size != self.output_size:
+            self.output_size = size
+            self._start(self._position)
+
+    def _start(self, frame_index):
+        self._stop()
+        command = [self._ffmpeg, "-v", "error", "-nostdin"]
+        if self._threads:
+            command += ["-threads", str(self._threads)]
+        if frame_index:
+            command += ["-ss", f"{frame_index / self._fps:.6f}"]
+        command += ["-i", self._video_source, "-map", "0:v:0", "-an", "-sn"]
+        if self.output_size:
+            command += ["-vf", f"scale={self.output_size[0]}:{self.output_size[1]}:flags=area"]
+        command += ["-f", "rawvideo", "-pix_fmt", "bgr24", "-"]
+        width, height = self.output_size or (self._width, self._height)
+        self._process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                         bufsize=width * height * 3 * 2)
+        self._position = frame_index
+
+    def _stop(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.stdout.close()
+            self._process.wait()
+            self._process = None
+
+    def isOpened(self):
+        return self._process is not None
+
+    def grab(self):
+        if self._process is None:
+            return False
+        width, height = self.output_size or (self._width, self._height)
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        view = memoryview(frame).cast("B")
+        filled = 0
+        while filled < len(view):
+            count = self._process.stdout.readinto(view[filled:])
+            if not count:
+                self._current = None
+                return False
+            filled += count
+        self._current = frame
+        self._position += 1
+        return True
+
+    def retrieve(self):
+        if self._current is None:
+            return False, None
+        return True, self._current
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self._fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self._frame_count)
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self._width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self._height)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self._position)
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return max(self._position - 1, 0) / self._fps * 1000.0
+        return 0.0
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self._start(max(0, int(value)))
+            return True
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            self._start(max(0, int(value / 1000.0 * self._fps)))
+            return True
+        return False
+
+    def release(self):
+        self._stop()
+
+
+def _parse_rate(rate):
+    if not rate or rate in ("0/0", "N/A"):
+        return 0.0
+    numerator, _, denominator = rate.partition("/")
+    return float(numerator) / float(denominator or 1)
+
+
+DECODER_BACKENDS = {
+    BACKEND_OPENCV: OpenCVCapture,
+    BACKEND_PYAV: PyAVCapture,
+    BACKEND_FFMPEG: FFmpegPipeCapture,
+}
+
+
+# 依副檔名決定這個檔案要使用哪一個後端
+def preferred_backend(video_source):
+    extension = os.path.splitext(video_source)[1].lower()
+    return BACKEND_BY_EXTENSION.get(extension, DEFAULT_BACKEND)
+
+
+# 開啟影片並回傳與 cv2.VideoCapture 相容的物件
+# backend 為 None 時依 preferred_backend 選擇；指定的後端無法使用（沒有安裝 PyAV、找不到 ffmpeg）時改用 OpenCV
+def open_capture(video_source, backend=None, threads=0):
+    backend = backend or preferred_backend(video_source)
+    if backend not in DECODER_BACKENDS:
+        raise ValueError(f"unknown decoder backend: {backend}")
+    if backend != BACKEND_OPENCV:
+        try:
+            return DECODER_BACKENDS[backend](video_source, threads)
+        except (ImportError, OSError, subprocess.SubprocessError, ValueError) as e:
+            print(f"Decoder backend '{backend}' unavailable ({e}), falling back to OpenCV")
+    return OpenCVCapture(video_source, threads)
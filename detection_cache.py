@@ -0,0 +1,212 @@
+# detection_cache.py
+# 每部影片的偵測結果快取：依幀號存放偵測框、信心度與類別，存成影片旁邊的 sidecar 檔（未壓縮的 .npz，欄位式陣列）
+# 檔名包含模型設定（cfg、權重、輸入大小、門檻值）的雜湊，檔案內記錄影片內容的雜湊，影片或模型改變時自動失效
+# 讀取時以 memmap 直接對應到檔案，重播、拖動進度條或重新開啟檔案時直接從快取取出偵測結果，不需要再推論
+import hashlib
+import os
+import threading
+import zipfile
+
+import cv2
+import numpy as np
+
+from decoder import open_capture
+from detector import (Detection, YOLO_CFG, YOLO_WEIGHTS, DEFAULT_INPUT_SIZE, DEFAULT_CONF_THRESHOLD,
+                      DEFAULT_NMS_THRESHOLD)
+
+CACHE_VERSION = 1
+FINGERPRINT_CHUNK = 1024 * 1024
+
+
+# 影片內容的雜湊：檔案大小加上開頭、中間、結尾各 1MB（不需要讀完整個檔案）
+def video_fingerprint(video_path):
+    size = os.path.getsize(video_path)
+    digest = hashlib.sha1(str(size).encode())
+    with open(video_path, "rb") as f:
+        for offset in (0, max(size // 2 - FINGERPRINT_CHUNK // 2, 0), max(size - FINGERPRINT_CHUNK, 0)):
+            f.seek(offset)
+            digest.update(f.read(FINGERPRINT_CHUNK))
+    return digest.hexdigest()
+
+
+# 模型設定的雜湊：cfg 內容、權重檔大小、輸入大小、門檻值與類別過濾（參數與 detector.Detector 相同，不需要載入網路）
+# cfg 或權重檔不存在時產生 OSError
+def model_key(cfg=YOLO_CFG, weights=YOLO_WEIGHTS, input_size=DEFAULT_INPUT_SIZE, conf_threshold=DEFAULT_CONF_THRESHOLD,
+              nms_threshold=DEFAULT_NMS_THRESHOLD, classes=None):
+    digest = hashlib.sha1()
+    with open(cfg, "rb") as f:
+        digest.update(f.read())
+    digest.update(str(os.path.getsize(weights)).encode())
+    digest.update(repr((input_size, conf_threshold, nms_threshold, classes)).encode())
+    return digest.hexdigest()[:12]
+
+
+# 例如 video.mp4 -> video.mp4.det-1a2b3c4d5e6f.npz
+def sidecar_path(video_path, key):
+    return f"{video_path}.det-{key}.npz"
+
+
+# 以 memmap 讀取未壓縮 .npz 中的每個陣列（資料不會一次讀進記憶體）；壓縮過的成員改為一般讀取
+def load_npz_memmap(path):
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            name = info.filename[:-len(".npy")]
+            if info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member)
+                continue
+            # 本地檔頭長度為 30 位元組加上檔名與額外欄位，之後才是 .npy 的內容
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = np.frombuffer(f.read(4), dtype="<u2")
+            f.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+            version = np.lib.format.read_magic(f)
+            read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+            shape, fortran_order, dtype = read_header(f)
+            if dtype.hasobject or not shape or 0 in shape:
+                f.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+                arrays[name] = np.lib.format.read_array(f)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                                         order="F" if fortran_order else "C")
+    return arrays
+
+
+class DetectionCache:
+    def __init__(self, video_path, key, frame_count, labels, fingerprint=None):
+        self.video_path = video_path
+        self.key = key
+        self.labels = labels  # 類別編號 -> 名稱
+        self.fingerprint = fingerprint or video_fingerprint(video_path)
+        self.done = np.zeros(frame_count, dtype=bool)  # 每一幀是否已經偵測過（沒有偵測到物件的幀也算）
+        # 欄位式的偵測結果，依幀號排序；frames[i] 為第 i 個偵測框所屬的幀
+        self.frames = np.zeros(0, dtype=np.int32)
+        self.boxes = np.zeros((0, 4), dtype=np.int32)
+        self.scores = np.zeros(0, dtype=np.float32)
+        self.classes = np.zeros(0, dtype=np.int16)
+        self._pending = {}  # 還沒合併進欄位陣列的新結果：幀號 -> [Detection, ...]
+        self._dirty = False  # 讀取或上一次存檔之後是否有新的結果
+        self._lock = threading.Lock()
+
+    @property
+    def complete(self):
+        return bool(self.done.all())
+
+    # 取得一幀的偵測結果；還沒偵測過時回傳 None
+    def get(self, frame_index):
+        if not 0 <= frame_index < len(self.done) or not self.done[frame_index]:
+            return None
+        with self._lock:
+            pending = self._pending.get(frame_index)
+            if pending is not None:
+                return pending
+            start, stop = np.searchsorted(self.frames, [frame_index, frame_index + 1])
+        return [Detection(int(c), self.labels[int(c)], float(s), tuple(int(v) for v in b))
+                for b, s, c in zip(self.boxes[start:stop], self.scores[start:stop], self.classes[start:stop])]
+
+    def put(self, frame_index, detections):
+        if 0 <= frame_index < len(self.done):
+            with self._lock:
+                self._pending[frame_index] = list(detections)
+                self.done[frame_index] = True
+                self._dirty = True
+
+    # 把新的結果合併進欄位陣列（依幀號排序）
+    # 合併期間新的結果仍留在 _pending 中讓 get 取得，換上新的陣列時才在同一個鎖內移除已合併的部分
+    def _merge(self):
+        with self._lock:
+            pending = dict(self._pending)
+        if not pending:
+            return
+        new = [(index, d) for index, detections in pending.items() for d in detections]
+        keep = ~np.isin(self.frames, list(pending))
+        frames = np.concatenate([self.frames[keep], np.array([i for i, _ in new], dtype=np.int32)])
+        boxes = np.concatenate([self.boxes[keep], np.array([d.box for _, d in new], dtype=np.int32).reshape(-1, 4)])
+        scores = np.concatenate([self.scores[keep], np.array([d.confidence for _, d in new], dtype=np.float32)])
+        classes = np.concatenate([self.classes[keep], np.array([d.class_id for _, d in new], dtype=np.int16)])
+        order = np.argsort(frames, kind="stable")
+        with self._lock:
+            self.frames, self.boxes, self.scores, self.classes = frames[order], boxes[order], scores[order], classes[order]
+            for index, detections in pending.items():
+                if self._pending.get(index) is detections:
+                    del self._pending[index]
+
+    # 沒有新的結果時不存檔
+    def save(self):
+        self._merge()
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            # 還對應到舊檔案的 memmap 先複製到記憶體，Windows 上不能取代正在被對應的檔案
+            if isinstance(self.frames, np.memmap):
+                self.frames, self.boxes, self.scores, self.classes = (
+                    np.array(self.frames), np.array(self.boxes), np.array(self.scores), np.array(self.classes))
+        path = sidecar_path(self.video_path, self.key)
+        # np.savez 會自動補上 .npz 副檔名，先寫到暫存檔再改名，避免其他程式讀到寫到一半的檔案
+        tmp_path = path[:-len(".npz")] + ".tmp.npz"
+        try:
+            np.savez(tmp_path, version=CACHE_VERSION, fingerprint=self.fingerprint, done=self.done,
+                     frames=self.frames, boxes=self.boxes, scores=self.scores, classes=self.classes)
+            os.replace(tmp_path, path)
+        except OSError:
+            self._dirty = True  # 下一次再試
+            raise
+
+    # 讀取影片旁的快取檔；不存在、版本不符或影片內容不同時回傳新的空快取
+    @classmethod
+    def load(cls, video_path, key, frame_count, labels):
+        fingerprint = video_fingerprint(video_path)
+        cache = cls(video_path, key, frame_count, labels, fingerprint)
+        try:
+            data = load_npz_memmap(sidecar_path(video_path, key))
+            if int(data["version"]) != CACHE_VERSION or str(data["fingerprint"]) != fingerprint \
+                    or len(data["done"]) != frame_count:
+                return cache
+            cache.done = np.array(data["done"])
+            cache.frames, cache.boxes, cache.scores, cache.classes = \
+                data["frames"], data["boxes"], data["scores"], data["classes"]
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            pass
+        return cache
+
+
+# 在背景以批次偵測填滿快取：從第一個還沒偵測的幀開始依序讀到結尾，每 save_every 幀存檔一次
+# detector 只能在這個執行緒中使用（cv2.dnn 的網路不是執行緒安全的）
+class DetectionCacheBuilder(threading.Thread):
+    def __init__(self, video_path, detector, cache, backend=None, save_every=500):
+        super().__init__(daemon=True)
+        self.video_path = video_path
+        self.detector = detector
+        self.cache = cache
+        self.backend = backend
+        self.save_every = save_every
+        self._stopped = False
+
+    def stop(self):
+        self._stopped = True
+
+    def run(self):
+        if self.cache.complete:
+            return
+        start = int(np.argmin(self.cache.done))  # 第一個還沒偵測的幀
+        vid = open_capture(self.video_path, self.backend)
+        try:
+            if start:
+                vid.set(cv2.CAP_PROP_POS_FRAMES, start)
+            frames = len(self.cache.done) - start
+            for index, detections in self.detector.iter_detections(vid, max_frames=frames, start_frame=start):
+                self.cache.put(index, detections)  # 停止前已經偵測完的幀也保留
+                if self._stopped:
+                    break
+                if (index + 1) % self.save_every == 0:
+                    self._save()
+        finally:
+            vid.release()
+            self._save()
+
+    def _save(self):
+        try:
+            self.cache.save()
+        except OSError:
+            pass  # 影片所在的資料夾不能寫入時，只在記憶體中使用快取
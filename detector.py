@@ -0,0 +1,192 @@
+# detector.py
+# YOLOv4-tiny 物件偵測：以 cv2.dnn.readNetFromDarknet 載入 yolo/ 目錄中的 yolov4-tiny.cfg 與權重檔，使用 CPU 執行
+# 輸入大小可設定（320 / 416 / 608），信心度過濾與 NMS 都以 NumPy 向量化處理，回傳帶有類別名稱的偵測框
+# 離線分析整個檔案時可以批次偵測：K 個幀用 cv2.dnn.blobFromImages 組成一個 blob，只呼叫一次 forward
+# 直接執行這個檔案可以在沒有 GUI 的情況下量測每秒可以偵測幾幀（--batch 時同時比較逐幀與批次）：
+#     python detector.py 影片路徑 [--size 416] [--frames 300] [--batch 8]
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+YOLO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "yolo")
+YOLO_CFG = os.path.join(YOLO_DIR, "yolov4-tiny.cfg")
+YOLO_WEIGHTS = os.path.join(YOLO_DIR, "yolov4-tiny.weights")  # 權重檔沒有放在版本庫中，需要另外下載
+YOLO_NAMES = os.path.join(YOLO_DIR, "coco.names")
+
+INPUT_SIZES = (320, 416, 608)
+DEFAULT_INPUT_SIZE = 416
+DEFAULT_CONF_THRESHOLD = 0.5
+DEFAULT_NMS_THRESHOLD = 0.4
+
+
+# 一個偵測結果：類別編號、類別名稱、信心度、偵測框 (x, y, w, h)（原始幀的座標）
+class Detection:
+    __slots__ = ("class_id", "label", "confidence", "box")
+
+    def __init__(self, class_id, label, confidence, box):
+        self.class_id = class_id
+        self.label = label
+        self.confidence = confidence
+        self.box = box
+
+    def __repr__(self):
+        return f"Detection({self.label}, {self.confidence:.2f}, {self.box})"
+
+
+def load_labels(path=YOLO_NAMES):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+class Detector:
+    def __init__(self, cfg=YOLO_CFG, weights=YOLO_WEIGHTS, names=YOLO_NAMES, input_size=DEFAULT_INPUT_SIZE,
+                 conf_threshold=DEFAULT_CONF_THRESHOLD, nms_threshold=DEFAULT_NMS_THRESHOLD, classes=None):
+        if input_size % 32:
+            raise ValueError(f"input size must be a multiple of 32: {input_size}")
+        if not os.path.exists(weights):
+            raise FileNotFoundError(f"YOLO weights not found: {weights}")
+        if not hasattr(cv2.dnn, "readNetFromDarknet"):
+            # OpenCV 5 移除了 Darknet 格式的讀取，需要使用 OpenCV 4.x
+            raise RuntimeError(f"this OpenCV build ({cv2.__version__}) cannot read Darknet models")
+        self.cfg = cfg
+        self.weights = weights
+        self.net = cv2.dnn.readNetFromDarknet(cfg, weights)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.output_names = self.net.getUnconnectedOutLayersNames()
+        self.labels = load_labels(names)
+        self.input_size = input_size
+        self.conf_threshold = conf_threshold
+        self.nms_threshold = nms_threshold
+        self.classes = classes  # 只保留這些類別編號（None 表示全部）
+        self.batch_size = 8  # iter_detections 每次送進網路的幀數
+        self.frames = 0  # 已偵測的幀數
+        self.total_time = 0.0  # 累計的偵測時間（秒）
+        self.last_time = 0.0
+        self._lock = threading.Lock()  # 混合模式與追丟後的找回可能在不同的執行緒使用同一個網路
+
+    # 偵測一個 BGR 幀，回傳 [Detection, ...]
+    def detect(self, frame):
+        start = time.perf_counter()
+        blob = cv2.dnn.blobFromImage(frame, 1 / 255.0, (self.input_size, self.input_size), swapRB=True, crop=False)
+        with self._lock:
+            self.net.setInput(blob)
+            outputs = self.net.forward(self.output_names)
+        detections = self.postprocess(outputs, frame.shape[1], frame.shape[0])
+        self._count(time.perf_counter() - start)
+        return detections
+
+    # 批次偵測多個 BGR 幀（大小可以不同），只做一次 forward，回傳每一幀的 [Detection, ...]
+    def detect_batch(self, frames):
+        start = time.perf_counter()
+        blob = cv2.dnn.blobFromImages(frames, 1 / 255.0, (self.input_size, self.input_size), swapRB=True, crop=False)
+        with self._lock:
+            self.net.setInput(blob)
+            outputs = self.net.forward(self.output_names)
+        # 每個輸出層的形狀為 (幀數, 框數, 85)；部分版本會把所有幀的框接在一起，這時依幀數平均切開
+        outputs = [out if out.ndim == 3 else out.reshape(len(frames), -1, out.shape[-1]) for out in outputs]
+        detections = [self.postprocess([out[i] for out in outputs], frame.shape[1], frame.shape[0])
+                      for i, frame in enumerate(frames)]
+        self._count(time.perf_counter() - start, len(frames))
+        return detections
+
+    # 依序讀取 vid（與 cv2.VideoCapture 相容的物件）並以 batch_size 個幀為一批偵測，
+    # 產生 (幀號, [Detection, ...])；batch_size 為 1 時逐幀偵測
+    def iter_detections(self, vid, batch_size=None, max_frames=None, start_frame=0):
+        batch_size = batch_size or self.batch_size
+        index = start_frame
+        frames = []
+        while max_frames is None or index - start_frame + len(frames) < max_frames:
+            ret, frame = vid.read()
+            if not ret:
+                break
+            frames.append(frame)
+            if len(frames) == batch_size:
+                for detections in (self.detect_batch(frames) if batch_size > 1 else [self.detect(frames[0])]):
+                    yield index, detections
+                    index += 1
+                frames = []
+        if frames:
+            for detections in self.detect_batch(frames):
+                yield index, detections
+                index += 1
+
+    # 把網路輸出（每列為 cx, cy, w, h, objectness, 各類別分數，座標為 0~1 的比例）轉成原始幀座標的偵測框
+    def postprocess(self, outputs, frame_width, frame_height):
+        rows = np.vstack(outputs)
+        scores = rows[:, 5:]
+        class_ids = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(rows)), class_ids]
+        keep = confidences > self.conf_threshold
+        if self.classes is not None:
+            keep &= np.isin(class_ids, self.classes)
+        if not keep.any():
+            return []
+        rows, class_ids, confidences = rows[keep], class_ids[keep], confidences[keep]
+        sizes = rows[:, 2:4] * (frame_width, frame_height)
+        corners = rows[:, 0:2] * (frame_width, frame_height) - sizes / 2
+        boxes = np.hstack([corners, sizes])
+        # 不同類別的框不互相抑制：依類別把框平移到不重疊的位置後一次做 NMS
+        offset = class_ids[:, None] * (max(frame_width, frame_height) + 1)
+        shifted = boxes.copy()
+        shifted[:, 0:2] += offset
+        indices = cv2.dnn.NMSBoxes(shifted.tolist(), confidences.tolist(), self.conf_threshold, self.nms_threshold)
+        indices = np.array(indices, dtype=int).reshape(-1)
+        return [
+            Detection(int(class_ids[i]), self.labels[class_ids[i]], float(confidences[i]),
+                      tuple(int(round(v)) for v in boxes[i]))
+            for i in indices
+        ]
+
+    def _count(self, elapsed, frames=1):
+        self.frames += frames
+        self.last_time = elapsed
+        self.total_time += elapsed
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "input_size": self.input_size,
+            "avg_ms": round(self.total_time / self.frames * 1000, 3) if self.frames else 0.0,
+            "fps": round(self.frames / self.total_time, 2) if self.total_time else 0.0,
+        }
+
+
+# 在 BGR 幀上畫出偵測框與類別名稱（給 OpenCV 視窗或匯出影片用；Qt 播放器使用覆蓋圖層）
+def draw_detections(frame, detections, color=(0, 255, 0)):
+    for detection in detections:
+        x, y, w, h = detection.box
+        cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+        cv2.putText(frame, f"{detection.label} {detection.confidence:.2f}", (x, max(y - 5, 10)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+    return frame
+
+
+# 沒有 GUI 的量測：讀取影片的前 frames 幀做偵測，印出每秒偵測的幀數；指定 --batch 時再以批次偵測同樣的幀做比較
+def main():
+    import argparse
+
+    from decoder import open_capture
+
+    parser = argparse.ArgumentParser(description="Measure YOLOv4-tiny detection throughput")
+    parser.add_argument("video")
+    parser.add_argument("--size", type=int, default=416, choices=INPUT_SIZES)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--weights", default=YOLO_WEIGHTS)
+    parser.add_argument("--batch", type=int, default=1)
+    args = parser.parse_args()
+
+    for batch_size in sorted({1, args.batch}):
+        detector = Detector(weights=args.weights, input_size=args.size, conf_threshold=args.conf)
+        vid = open_capture(args.video)
+        total = sum(len(detections) for _, detections in detector.iter_detections(vid, batch_size, args.frames))
+        vid.release()
+        print(f"Batch {batch_size}: detections={total}, {detector.stats()}")
+
+
+if __name__ == "__main__":
+    main()
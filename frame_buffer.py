@@ -0,0 +1,200 @@
+# frame_buffer.py
+# 背景解碼執行緒與有界的幀環形緩衝區，讓 GUI 執行緒只需要取出已解碼好的幀
+import threading
+from collections import deque
+
+import cv2
+
+from seek_index import SEEK_ACCURATE
+
+
+# 一個已解碼的幀：幀號（從 0 開始）、時間戳（秒）與影像資料（BGR）
+class DecodedFrame:
+    __slots__ = ("index", "timestamp", "image")
+
+    def __init__(self, index, timestamp, image):
+        self.index = index
+        self.timestamp = timestamp
+        self.image = image
+
+
+# 有界的幀緩衝區
+# policy="block"：緩衝區滿時解碼執行緒等待 GUI 取走幀（適合一般播放，不會漏幀）
+# policy="drop"：緩衝區滿時丟棄最舊的幀，解碼端永遠不會被卡住（適合即時顯示）
+class FrameRingBuffer:
+    POLICIES = ("block", "drop")
+
+    def __init__(self, depth=8, policy="block"):
+        if depth < 1:
+            raise ValueError("depth must be >= 1")
+        if policy not in self.POLICIES:
+            raise ValueError(f"unknown policy: {policy}")
+        self.depth = depth
+        self.policy = policy
+        self.dropped = 0  # 因緩衝區已滿而被丟棄的幀數
+        self.generation = 0  # 每次清空緩衝區就加一，用來辨識清空之前解碼出來的舊幀
+        self._frames = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def __len__(self):
+        with self._cond:
+            return len(self._frames)
+
+    # 放入一幀；回傳 False 表示緩衝區已關閉或被清空（例如使用者拖動了進度條），這一幀應被丟棄
+    def put(self, frame, generation=None):
+        with self._cond:
+            if generation is None:
+                generation = self.generation
+            if self.policy == "block":
+                while len(self._frames) >= self.depth and not self._closed and generation == self.generation:
+                    self._cond.wait()
+            elif len(self._frames) >= self.depth:
+                self._frames.popleft()
+                self.dropped += 1
+            if self._closed or generation != self.generation:
+                return False
+            self._frames.append(frame)
+            self._cond.notify_all()
+            return True
+
+    # 取出最舊的一幀；block=False 時若沒有可用的幀立即回傳 None
+    def get(self, block=True, timeout=None):
+        with self._cond:
+            if block:
+                self._cond.wait_for(lambda: self._frames or self._closed, timeout)
+            if not self._frames:
+                return None
+            frame = self._frames.popleft()
+            self._cond.notify_all()
+            return frame
+
+    # 查看最舊的一幀但不取出，沒有時回傳 None
+    def peek(self):
+        with self._cond:
+            return self._frames[0] if self._frames else None
+
+    # 清空緩衝區並喚醒等待中的解碼執行緒
+    def clear(self):
+        with self._cond:
+            self._frames.clear()
+            self.generation += 1
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._frames.clear()
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+
+# 背景解碼執行緒：持續從 cv2.VideoCapture 讀取幀並預先放入緩衝區
+# VideoCapture 不是執行緒安全的，所以啟動後所有對 vid 的操作（讀取、跳轉）都必須透過這個物件
+class FrameReader(threading.Thread):
+    def __init__(self, vid, depth=8, policy="block", start_frame=0):
+        super().__init__(daemon=True)
+        self.vid = vid
+        self.seek_index = None  # 關鍵幀索引（seek_index.SeekIndex），背景建立完成後由播放器設定
+        self.cache = None  # 已解碼幀的 LRU 快取（frame_cache.FrameCache），設定後每個解碼出來的幀都會放進去
+        self.tracking_worker = None  # 背景追蹤執行緒（tracking_worker.TrackingWorker），設定後每個解碼出來的幀都會交給它
+        self.buffer = FrameRingBuffer(depth, policy)
+        self.fps = vid.get(cv2.CAP_PROP_FPS) or 30.0
+        self.eof = False  # 是否已讀到影片結尾
+        self._next_index = start_frame  # 下一個要解碼的幀號
+        self._seek_to = (start_frame, SEEK_ACCURATE) if start_frame else None  # 等待解碼執行緒處理的跳轉請求
+        self._output_size = None  # 等待解碼執行緒套用的輸出大小（(size,) 表示有新的請求）
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+
+    # 要求跳轉到指定幀，舊的預讀幀會被清掉
+    # mode 為 seek_index.SEEK_KEYFRAME 時只跳到最近的關鍵幀（需要已建立好索引），SEEK_ACCURATE 則精確跳到該幀
+    def seek(self, frame_index, mode=SEEK_ACCURATE):
+        with self._lock:
+            self._seek_to = (max(0, int(frame_index)), mode)
+            self.eof = False
+            self.buffer.clear()
+        self._wake.set()
+
+    # 要求解碼器改用新的輸出大小（None 為原始解析度），並從 frame_index 重新解碼，緩衝區與快取中舊大小的幀都會被清掉
+    def set_output_size(self, size, frame_index):
+        with self._lock:
+            self._output_size = (size,)
+            self._seek_to = (max(0, int(frame_index)), SEEK_ACCURATE)
+            self.eof = False
+            self.buffer.clear()
+        self._wake.set()
+
+    # 取出下一個已解碼的幀（DecodedFrame），沒有時回傳 None
+    def read(self, block=False, timeout=None):
+        return self.buffer.get(block=block, timeout=timeout)
+
+    # 查看下一個已解碼的幀但不取出
+    def peek(self):
+        return self.buffer.peek()
+
+    # 下一個 read 會取得的幀號；正在跳轉到關鍵幀（實際的幀號還不知道）時回傳 None
+    def next_index(self):
+        with self._lock:
+            if self._seek_to is not None:
+                frame_index, mode = self._seek_to
+                return frame_index if mode == SEEK_ACCURATE else None
+            frame = self.buffer.peek()
+            return frame.index if frame is not None else self._next_index
+
+    def stop(self):
+        self._stopped = True
+        self.buffer.close()
+        self._wake.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout=1.0)
+
+    def run(self):
+        while not self._stopped:
+            with self._lock:
+                seek_to, self._seek_to = self._seek_to, None
+                output_size, self._output_size = self._output_size, None
+                generation = self.buffer.generation
+            if output_size is not None:
+                if hasattr(self.vid, "set_output_size"):
+                    self.vid.set_output_size(output_size[0])
+                if self.cache is not None:
+                    self.cache.clear()
+            if seek_to is not None:
+                frame_index, mode = seek_to
+                if self.seek_index is not None:
+                    self._next_index = self.seek_index.seek(self.vid, frame_index, mode)
+                else:
+                    self.vid.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+                    self._next_index = frame_index
+                self.eof = False
+
+            if self.eof:
+                # 已到結尾，等待跳轉或停止
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            if self._seek_to is not None:
+                continue
+
+            ret, image = self.vid.read()
+            if not ret:
+                self.eof = True
+                continue
+            timestamp = self.vid.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            if timestamp <= 0 and self._next_index > 0:
+                timestamp = self._next_index / self.fps
+            frame = DecodedFrame(self._next_index, timestamp, image)
+            if self.cache is not None:
+                self.cache.put(frame.index, image)
+            # 解碼期間收到跳轉請求的話，generation 已經改變，這一幀會被丟棄（也不會交給追蹤執行緒）
+            queued = self.buffer.put(frame, generation)
+            self._next_index += 1  # 放進緩衝區之後才前進，next_index 不會跳過還沒放進去的幀
+            if queued:
+                tracking_worker = self.tracking_worker
+                if tracking_worker is not None:
+                    tracking_worker.submit(frame.index, image)
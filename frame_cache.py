@@ -0,0 +1,63 @@
+# frame_cache.py
+# 最近解碼過的幀的 LRU 快取（以幀號為鍵，依記憶體用量上限淘汰），
+# 讓逐幀前進 / 後退、小幅倒轉和 clear_trace 之後的重新顯示都不需要再經過解碼器
+import threading
+from collections import OrderedDict
+
+
+class FrameCache:
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes  # 快取可使用的記憶體上限（位元組）
+        self.bytes = 0  # 目前快取佔用的記憶體
+        self.hits = 0
+        self.misses = 0
+        self._frames = OrderedDict()  # 幀號 -> 影像，最近使用的放在最後面
+        self._lock = threading.Lock()  # 解碼執行緒放入、GUI 執行緒讀取
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __contains__(self, frame_index):
+        return frame_index in self._frames
+
+    # 取出快取中的幀，沒有時回傳 None；會更新命中 / 未命中計數
+    def get(self, frame_index):
+        with self._lock:
+            image = self._frames.get(frame_index)
+            if image is None:
+                self.misses += 1
+                return None
+            self._frames.move_to_end(frame_index)
+            self.hits += 1
+            return image
+
+    # 放入一幀；超過記憶體上限時淘汰最久沒用到的幀
+    # 快取中的影像會被共用，放入之後不可再修改（例如在上面畫追蹤框）
+    def put(self, frame_index, image):
+        if image.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._frames.pop(frame_index, None)
+            if old is not None:
+                self.bytes -= old.nbytes
+            self._frames[frame_index] = image
+            self.bytes += image.nbytes
+            while self.bytes > self.max_bytes:
+                _, evicted = self._frames.popitem(last=False)
+                self.bytes -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self.bytes = 0
+
+    # 命中率等統計資料，方便顯示或輸出到 log
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "frames": len(self._frames),
+            "bytes": self.bytes,
+        }
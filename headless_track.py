@@ -0,0 +1,150 @@
+# headless_track.py
+# 沒有 GUI 的追蹤：以最快的速度解碼並追蹤整部影片，不做任何繪製，把每一幀的追蹤框寫成 CSV / JSON / NumPy 檔，
+# 或是播放器可以直接讀取的 .tracks 檔（track_store）
+# 解碼在背景執行緒（frame_buffer.FrameReader）中進行，與追蹤同時執行；結束時印出每秒處理的幀數
+# 初始的目標可以直接指定 ROI，或指定類別名稱由 YOLOv4-tiny 在第一幀偵測：
+#     python headless_track.py 影片路徑 --roi 100,80,60,120 [--roi ...] [--tracker csrt] [--output tracks.csv]
+#     python headless_track.py 影片路徑 --detect-class person [--max-targets 5] [--output 影片路徑.tracks]
+import argparse
+import csv
+import json
+import os
+import time
+
+import numpy as np
+
+from decoder import open_capture, DECODER_BACKENDS
+from detector import Detector, INPUT_SIZES
+from frame_buffer import FrameReader
+from loss_recovery import RecoveringTracker
+from multi_tracker import MultiTracker
+from tracker_registry import TRACKER_FACTORIES, TRACKING_RESOLUTIONS, DEFAULT_TRACKER, create_tracker
+from track_store import TRACK_DTYPE, MODE_TRUNCATE, TrackStoreWriter, track_records
+from detection_cache import video_fingerprint
+
+# 每一幀每個目標一列：幀號、目標編號、追蹤框、信心度、旗標（track_store.FLAG_*）
+TRACK_COLUMNS = TRACK_DTYPE.names
+
+
+# 在第一幀偵測指定類別（名稱或編號）的物件，依信心度由高到低取前 max_targets 個當作初始的 ROI
+def detect_rois(detector, frame, class_name, max_targets=None):
+    class_id = int(class_name) if class_name.isdigit() else detector.labels.index(class_name)
+    detections = sorted((d for d in detector.detect(frame) if d.class_id == class_id),
+                        key=lambda d: d.confidence, reverse=True)
+    return [d.box for d in detections[:max_targets]]
+
+
+# 追蹤整部影片（或從 start_frame 開始的 max_frames 幀），回傳 (TRACK_DTYPE 的結構陣列, 統計資料)
+# rois 與 detect_class 二選一；detector 為 None 且需要偵測時會自動載入
+# threads 限制解碼與多目標追蹤使用的執行緒數（0 表示依核心數自動決定），多個行程同時執行時避免搶用核心
+def track_video(video_path, rois=None, detect_class=None, tracker_name=None, resolution=None, backend=None,
+                start_frame=0, max_frames=None, detector=None, max_targets=None, recovery_budget=0.05, threads=0):
+    vid = open_capture(video_path, backend, threads)
+    if not vid.isOpened():
+        raise OSError(f"cannot open video: {video_path}")
+    reader = FrameReader(vid, depth=16, start_frame=start_frame)
+    reader.start()
+    trackers = MultiTracker(threads or None)
+    rows = []
+    frames = 0
+    wait_time = 0.0  # 等待解碼的時間（秒），代表解碼跟不上追蹤
+    start = time.perf_counter()
+    try:
+        while max_frames is None or frames < max_frames:
+            wait_start = time.perf_counter()
+            decoded = reader.read(block=True, timeout=0.1)
+            wait_time += time.perf_counter() - wait_start
+            if decoded is None:
+                if reader.eof and not len(reader.buffer):
+                    break
+                continue
+            frame = decoded.image
+            if frames == 0:
+                if detect_class is not None:
+                    detector = detector or Detector()
+                    rois = detect_rois(detector, frame, detect_class, max_targets)
+                for roi in rois or ():
+                    tracker = create_tracker(tracker_name, resolution)
+                    trackers.add(RecoveringTracker(tracker, detector, budget=recovery_budget), frame, roi)
+                if not trackers:
+                    raise ValueError(f"no targets to track in {video_path}")
+                rows += track_records(decoded.index, [(target_id, True, tracker.last_bbox)
+                                                      for target_id, tracker in trackers.targets.items()])
+            else:
+                rows += track_records(decoded.index, trackers.update(frame), trackers.targets)
+            frames += 1
+    finally:
+        reader.stop()
+        vid.release()
+    elapsed = time.perf_counter() - start
+    stats = {
+        "video": video_path,
+        "frames": frames,
+        "targets": len(trackers),
+        "seconds": round(elapsed, 3),
+        "fps": round(frames / elapsed, 2) if elapsed else 0.0,
+        "decode_wait": round(wait_time, 3),
+        "tracking": trackers.stats(),
+        "trackers": {target_id: tracker.stats() for target_id, tracker in trackers.targets.items()},
+    }
+    trackers.shutdown()
+    return np.array(rows, dtype=TRACK_DTYPE), stats
+
+
+# 依副檔名寫成 .csv、.json、.npy 或 .tracks（.tracks 需要影片路徑來記錄影片內容的雜湊）；已經存在的檔案會被覆寫
+def write_tracks(path, tracks, video_path=None):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".npy":
+        np.save(path, tracks)
+    elif extension == ".tracks":
+        writer = TrackStoreWriter(path, video_fingerprint(video_path), mode=MODE_TRUNCATE)
+        writer.extend(tracks)
+        writer.close()
+    elif extension == ".csv":
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(TRACK_COLUMNS)
+            writer.writerows(row.tolist() for row in tracks)
+    elif extension == ".json":
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump([dict(zip(TRACK_COLUMNS, row.tolist())) for row in tracks], f)
+    else:
+        raise ValueError(f"unsupported output format: {extension}")
+
+
+def parse_roi(text):
+    values = tuple(int(v) for v in text.split(","))
+    if len(values) != 4:
+        raise argparse.ArgumentTypeError(f"ROI must be x,y,w,h: {text}")
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Track objects in a video without the GUI, as fast as possible")
+    parser.add_argument("video")
+    targets = parser.add_mutually_exclusive_group(required=True)
+    targets.add_argument("--roi", type=parse_roi, action="append", help="initial box x,y,w,h (repeatable)")
+    targets.add_argument("--detect-class", help="detect targets of this class (name or id) on the first frame")
+    parser.add_argument("--max-targets", type=int, default=None)
+    parser.add_argument("--tracker", default=DEFAULT_TRACKER, choices=list(TRACKER_FACTORIES))
+    parser.add_argument("--resolution", default=TRACKING_RESOLUTIONS[0], choices=TRACKING_RESOLUTIONS)
+    parser.add_argument("--decoder", default=None, choices=list(DECODER_BACKENDS))
+    parser.add_argument("--start", type=int, default=0, help="first frame index")
+    parser.add_argument("--frames", type=int, default=None, help="number of frames to process")
+    parser.add_argument("--size", type=int, default=416, choices=INPUT_SIZES, help="detector input size")
+    parser.add_argument("--output", help="write boxes to a .csv, .json, .npy or .tracks file")
+    args = parser.parse_args()
+
+    detector = Detector(input_size=args.size) if args.detect_class is not None else None
+    tracks, stats = track_video(args.video, args.roi, args.detect_class, args.tracker, args.resolution, args.decoder,
+                                args.start, args.frames, detector, args.max_targets)
+    if args.output:
+        write_tracks(args.output, tracks, args.video)
+    for target_id, tracker_stats in stats.pop("trackers").items():
+        print(f"Tracker {target_id}: {tracker_stats}")
+    print(f"Tracking: {stats.pop('tracking')}")
+    print(f"Throughput: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# hybrid_tracker.py
+# 偵測加追蹤的混合模式：每 N 幀執行一次 YOLOv4-tiny 偵測，中間的幀由追蹤器延續追蹤框
+# 有追蹤器追丟時下一幀立刻偵測一次，之後仍然追丟的期間改為每 N / 4 幀偵測一次（目標離開畫面時不會每一幀都偵測）
+# 偵測結果與追蹤框以 IoU 配對，重疊不夠的追蹤器用偵測框重新初始化，修正追蹤器累積的漂移
+# N 依照量測到的偵測與追蹤時間自動調整，讓平均每幀的處理時間不超過一幀的時間，維持即時播放
+import math
+import time
+
+import numpy as np
+
+from multi_tracker import MultiTracker
+
+
+# 兩組框 (x, y, w, h) 之間的 IoU 矩陣，形狀為 (len(a), len(b))
+def iou_matrix(a, b):
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 0] + a[:, None, 2], b[None, :, 0] + b[None, :, 2])
+    y2 = np.minimum(a[:, None, 1] + a[:, None, 3], b[None, :, 1] + b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    union = (a[:, None, 2] * a[:, None, 3]) + (b[None, :, 2] * b[None, :, 3]) - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0)
+
+
+# 依 IoU 由大到小貪婪配對，回傳 [(a 的索引, b 的索引), ...]，IoU 低於 threshold 的不配對
+def match_boxes(a, b, threshold):
+    if not len(a) or not len(b):
+        return []
+    ious = iou_matrix(a, b)
+    pairs = []
+    used_a, used_b = set(), set()
+    for flat in np.argsort(ious, axis=None)[::-1]:
+        i, j = divmod(int(flat), ious.shape[1])
+        if ious[i, j] < threshold:
+            break
+        if i in used_a or j in used_b:
+            continue
+        pairs.append((i, j))
+        used_a.add(i)
+        used_b.add(j)
+    return pairs
+
+
+class HybridTracker(MultiTracker):
+    def __init__(self, detector, fps, max_workers=None, min_interval=2, max_interval=60, iou_threshold=0.3,
+                 reinit_iou=0.6):
+        super().__init__(max_workers)
+        self.detector = detector  # detector.Detector
+        self.frame_budget = 1.0 / (fps or 30.0)  # 每幀可用的時間（秒）
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.iou_threshold = iou_threshold
+        self.reinit_iou = reinit_iou  # 追蹤框與偵測框的 IoU 低於這個值才重新初始化（重疊夠多時追蹤器不需要修正）
+        self.interval = min_interval  # 目前每幾幀偵測一次，依量測到的時間調整
+        self.detections = None  # 上一次偵測的結果（detector.Detection）
+        self.corrections = 0  # 以偵測框修正追蹤器的次數
+        self.recovered = 0  # 追丟後由偵測找回的次數
+        self._since_detection = 0
+        self._lost_frames = 0  # 連續有追蹤器追丟的幀數，剛追丟的下一幀立刻偵測
+        self._last_boxes = {}  # 目標編號 -> 最後一次追蹤成功的框
+        self._detect_cost = None  # 偵測時間的移動平均（秒）
+        self._track_cost = None  # 追蹤時間的移動平均（秒）
+
+    def update(self, frame):
+        start = time.perf_counter()
+        results = super().update(frame)
+        self._track_cost = self._average(self._track_cost, time.perf_counter() - start)
+        self._since_detection += 1
+        interval = self.lost_interval if self._lost_frames else self.interval
+        if self._lost_frames == 1 or self._since_detection >= interval:
+            results = self._correct(frame, results)
+            self._since_detection = 0
+        self._lost_frames = self._lost_frames + 1 if any(not success for _, success, _ in results) else 0
+        for target_id, success, bbox in results:
+            if success:
+                self._last_boxes[target_id] = tuple(bbox)
+        return results
+
+    # 持續追丟期間每幾幀偵測一次
+    @property
+    def lost_interval(self):
+        return max(1, self.interval // 4)
+
+    # 執行偵測，把追蹤框（追丟的目標使用最後一次的位置）與偵測框配對
+    # 追丟的目標或 IoU 低於 reinit_iou 的追蹤器以偵測框重新初始化；有 reinit 的追蹤器（loss_recovery.RecoveringTracker）保留原本的樣板
+    def _correct(self, frame, results):
+        start = time.perf_counter()
+        self.detections = self.detector.detect(frame)
+        boxes = [tuple(bbox) if success else self._last_boxes.get(target_id, tuple(bbox))
+                 for target_id, success, bbox in results]
+        corrected = list(results)
+        for i, j in match_boxes(boxes, [d.box for d in self.detections], self.iou_threshold):
+            target_id, success, _ = results[i]
+            box = self.detections[j].box
+            if success and iou_matrix([boxes[i]], [box])[0, 0] >= self.reinit_iou:
+                continue
+            tracker = self.targets[target_id]
+            getattr(tracker, "reinit", tracker.init)(frame, box)
+            corrected[i] = (target_id, True, box)
+            self.corrections += 1
+            if not success:
+                self.recovered += 1
+        self._detect_cost = self._average(self._detect_cost, time.perf_counter() - start)
+        self._adapt_interval()
+        return corrected
+
+    # 偵測 1 次 + 追蹤 N 次的平均時間不超過一幀：(d + N * t) / N <= budget，N >= d / (budget - t)
+    def _adapt_interval(self):
+        if self._track_cost is None or self._track_cost >= self.frame_budget:
+            self.interval = self.max_interval
+        else:
+            needed = math.ceil(self._detect_cost / (self.frame_budget - self._track_cost))
+            self.interval = min(max(needed, self.min_interval), self.max_interval)
+
+    @staticmethod
+    def _average(current, sample, alpha=0.3):
+        return sample if current is None else current + alpha * (sample - current)
+
+    def stats(self):
+        stats = super().stats()
+        stats.update({
+            "interval": self.interval,
+            "corrections": self.corrections,
+            "recovered": self.recovered,
+            "detect_ms": round(self._detect_cost * 1000, 3) if self._detect_cost is not None else 0.0,
+        })
+        return stats
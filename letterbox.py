@@ -0,0 +1,46 @@
+# letterbox.py
+# 把影像等比例縮放、置中放進固定大小的顯示區域（補邊由畫布的背景負責，這裡只計算縮放大小與偏移量）
+# 縮放比例、偏移量與目標大小只在顯示區域或來源大小改變時重新計算；縮放結果直接寫入預先配置好的緩衝區，
+# 每一幀的顯示流程不再配置新的陣列
+import cv2
+import numpy as np
+
+
+class Letterbox:
+    def __init__(self, interpolation=cv2.INTER_LINEAR):
+        self.interpolation = interpolation
+        self.view_size = (0, 0)  # 顯示區域大小 (寬, 高)，只在 <Configure> / resizeEvent 時更新
+        self.source_size = None  # 上一次計算時的來源大小 (寬, 高)
+        self.scale = 1.0
+        self.x_offset = 0
+        self.y_offset = 0
+        self.target_size = (0, 0)  # 縮放後的影像大小 (寬, 高)
+        self._resized = None  # resize() 使用的緩衝區（目標大小）
+
+    # 顯示區域大小改變（例如畫布的 <Configure> 事件），回傳是否真的有改變
+    def set_view_size(self, width, height):
+        if (width, height) == self.view_size:
+            return False
+        self.view_size = (width, height)
+        self.source_size = None
+        return True
+
+    # 依照來源大小 (寬, 高) 取得縮放後的大小與偏移，和上一次相同時直接使用快取的結果
+    def fit(self, source_size):
+        if source_size != self.source_size:
+            self.source_size = source_size
+            view_width, view_height = self.view_size
+            self.scale = min(view_width / source_size[0], view_height / source_size[1])
+            self.target_size = (max(1, int(source_size[0] * self.scale)), max(1, int(source_size[1] * self.scale)))
+            self.x_offset = (view_width - self.target_size[0]) // 2
+            self.y_offset = (view_height - self.target_size[1]) // 2
+        return self.target_size
+
+    # 縮放成目標大小（不含補邊），寫入重複使用的緩衝區；已經是目標大小時直接回傳原本的影像
+    def resize(self, frame):
+        width, height = self.fit((frame.shape[1], frame.shape[0]))
+        if (width, height) == (frame.shape[1], frame.shape[0]):
+            return frame
+        if self._resized is None or self._resized.shape[:2] != (height, width):
+            self._resized = np.empty((height, width, 3), dtype=np.uint8)
+        return cv2.resize(frame, (width, height), dst=self._resized, interpolation=self.interpolation)
@@ -0,0 +1,173 @@
+# loss_recovery.py
+# 追丟後自動找回目標：追蹤器 update 失敗時，在最後一次追蹤成功的位置周圍搜尋，搜尋範圍隨著連續追丟的幀數變大
+# 依序嘗試兩種方法：多尺度的樣板比對（初始化時的目標影像），以及只保留原本類別的 YOLOv4-tiny 偵測
+# 每一幀的搜尋有時間預算，第一個在預算內成功的方法找到的框用來重新初始化追蹤器
+# 每個目標另外有一個等速度卡爾曼濾波：搜尋範圍以預測的位置為中心，平滑過的框給放大畫面使用
+import time
+
+import cv2
+
+from hybrid_tracker import iou_matrix
+from motion_model import KalmanBox
+
+STRATEGY_TEMPLATE = "template"
+STRATEGY_DETECTOR = "detector"
+
+
+def _gray(image):
+    return image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+# 包裝追蹤器（介面與 cv2.Tracker 相同），update 失敗時嘗試找回目標，找到時回傳成功與找回的框
+class RecoveringTracker:
+    def __init__(self, tracker, detector=None, budget=0.03, growth=1.0, max_growth=8,
+                 scales=(1.0, 0.8, 1.25), match_threshold=0.6, class_iou=0.3):
+        self.tracker = tracker  # tracker_registry.TimedTracker
+        self.detector = detector  # detector.Detector，None 表示只用樣板比對
+        self.budget = budget  # 每一幀搜尋的時間預算（秒）
+        self.growth = growth  # 每多追丟一幀，搜尋範圍增加幾倍的框大小
+        self.max_growth = max_growth  # 搜尋範圍最多增加到幾倍（之後不再變大）
+        self.scales = scales  # 樣板比對嘗試的縮放比例，依序嘗試
+        self.match_threshold = match_threshold  # 樣板比對的最低相關係數（TM_CCOEFF_NORMED）
+        self.class_iou = class_iou  # 初始化時偵測框與 ROI 的 IoU 至少要這麼大，才當作目標的類別
+        self.template = None  # 初始化時目標的灰階影像
+        self.class_id = None  # 目標的類別（初始化時由偵測器判斷，判斷不出來時不使用偵測器找回）
+        self.last_bbox = None  # 最後一次追蹤成功的框
+        self.motion = None  # motion_model.KalmanBox，初始化時建立
+        self.smoothed_bbox = None  # 卡爾曼濾波平滑過的框（追丟時為預測的位置）
+        self.misses = 0  # 連續追丟的幀數
+        self.just_recovered = False  # 這一幀是否是追丟後找回的
+        self.attempts = 0  # 嘗試找回的次數
+        self.recovered = {STRATEGY_TEMPLATE: 0, STRATEGY_DETECTOR: 0}  # 各方法成功找回的次數
+        self.recovery_time = 0.0  # 累計的搜尋時間（秒）
+
+    @property
+    def frames(self):
+        return self.tracker.frames
+
+    def init(self, frame, bbox):
+        self.tracker.init(frame, bbox)
+        x, y, w, h = (int(v) for v in bbox)
+        x, y = max(x, 0), max(y, 0)
+        patch = frame[y:y + h, x:x + w]
+        self.template = _gray(patch).copy() if patch.size else None
+        if self.template is not None and self.template.std() < 2:
+            self.template = None  # 沒有紋理的樣板在哪裡都比對得到，不使用
+        self.last_bbox = (x, y, w, h)
+        self.misses = 0
+        # 混合模式以偵測框重新初始化時只修正估計，保留目前的速度
+        if self.motion is None:
+            self.motion = KalmanBox(self.last_bbox)
+            self.smoothed_bbox = self.motion.box
+        else:
+            self.smoothed_bbox = self.motion.correct(self.last_bbox)
+        if self.detector is not None and self.class_id is None:
+            self.class_id = self._classify(frame, self.last_bbox)
+
+    # 以新的框重新初始化追蹤器（例如混合模式的偵測框），樣板與類別保留初始化時的（避免找錯時樣板跟著漂移）
+    def reinit(self, frame, bbox):
+        self.tracker.init(frame, bbox)
+        self.last_bbox = tuple(int(v) for v in bbox)
+        self.misses = 0
+        self.smoothed_bbox = self.motion.correct(self.last_bbox) if self.motion is not None else None
+
+    def update(self, frame):
+        success, bbox = self.tracker.update(frame)
+        self.just_recovered = False
+        if self.motion is None:
+            return success, bbox
+        predicted = self.motion.predict()
+        if success:
+            self.last_bbox = tuple(int(v) for v in bbox)
+            self.misses = 0
+            self.smoothed_bbox = self.motion.correct(bbox)
+            return success, bbox
+        self.misses += 1
+        found = self.recover(frame)
+        if found is None:
+            self.smoothed_bbox = predicted  # 追丟期間放大畫面沿著預測的方向繼續移動
+            return False, bbox
+        self.reinit(frame, found)
+        self.just_recovered = True
+        return True, found
+
+    # 搜尋範圍 (x1, y1, x2, y2)：以卡爾曼濾波預測的位置為中心，大小為最後的框的 1 + growth * 連續追丟幀數 倍，裁到畫面之內
+    def search_window(self, frame):
+        _, _, w, h = self.last_bbox
+        factor = 1 + self.growth * min(self.misses, self.max_growth)
+        x, y, predicted_w, predicted_h = self.motion.box
+        cx, cy = x + predicted_w / 2, y + predicted_h / 2
+        half_w, half_h = w * factor / 2, h * factor / 2
+        x1, y1 = int(max(cx - half_w, 0)), int(max(cy - half_h, 0))
+        x2, y2 = int(min(cx + half_w, frame.shape[1])), int(min(cy + half_h, frame.shape[0]))
+        return x1, y1, x2, y2
+
+    # 在時間預算內依序嘗試各個方法，回傳找到的框 (x, y, w, h) 或 None
+    def recover(self, frame):
+        start = time.perf_counter()
+        deadline = start + self.budget
+        self.attempts += 1
+        window = self.search_window(frame)
+        found = None
+        for strategy, search in ((STRATEGY_TEMPLATE, self._match_template), (STRATEGY_DETECTOR, self._redetect)):
+            if time.perf_counter() > deadline:
+                break
+            found = search(frame, window, deadline)
+            if found is not None:
+                self.recovered[strategy] += 1
+                break
+        self.recovery_time += time.perf_counter() - start
+        return found
+
+    # 在搜尋範圍內以不同大小的樣板做比對，相關係數最高且超過門檻的位置就是目標
+    def _match_template(self, frame, window, deadline):
+        if self.template is None:
+            return None
+        x1, y1, x2, y2 = window
+        region = _gray(frame[y1:y2, x1:x2])
+        best_score, best_box = self.match_threshold, None
+        for scale in self.scales:
+            if time.perf_counter() > deadline:
+                break
+            height, width = round(self.template.shape[0] * scale), round(self.template.shape[1] * scale)
+            if min(height, width) < 4 or height > region.shape[0] or width > region.shape[1]:
+                continue
+            template = self.template if scale == 1.0 else cv2.resize(
+                self.template, (width, height), interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+            _, score, _, location = cv2.minMaxLoc(cv2.matchTemplate(region, template, cv2.TM_CCOEFF_NORMED))
+            if score >= best_score:
+                best_score, best_box = score, (x1 + location[0], y1 + location[1], width, height)
+        return best_box
+
+    # 在搜尋範圍內執行偵測，只保留原本的類別，取信心度最高的框；剩下的時間不夠偵測一次時不執行
+    def _redetect(self, frame, window, deadline):
+        if self.detector is None or self.class_id is None:
+            return None
+        detector_stats = self.detector.stats()
+        if time.perf_counter() + detector_stats["avg_ms"] / 1000 > deadline:
+            return None
+        x1, y1, x2, y2 = window
+        detections = [d for d in self.detector.detect(frame[y1:y2, x1:x2]) if d.class_id == self.class_id]
+        if not detections:
+            return None
+        x, y, w, h = max(detections, key=lambda d: d.confidence).box
+        return x1 + x, y1 + y, w, h
+
+    # 初始化時偵測整個幀，與 ROI 重疊最多的偵測框的類別就是目標的類別
+    def _classify(self, frame, bbox):
+        detections = self.detector.detect(frame)
+        if not detections:
+            return None
+        ious = iou_matrix([bbox], [d.box for d in detections])[0]
+        best = int(ious.argmax())
+        return detections[best].class_id if ious[best] >= self.class_iou else None
+
+    def stats(self):
+        stats = self.tracker.stats()
+        stats.update({
+            "recovery_attempts": self.attempts,
+            "recovered_template": self.recovered[STRATEGY_TEMPLATE],
+            "recovered_detector": self.recovered[STRATEGY_DETECTOR],
+            "recovery_ms": round(self.recovery_time / self.attempts * 1000, 3) if self.attempts else 0.0,
+        })
+        return stats
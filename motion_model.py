@@ -0,0 +1,49 @@
+# motion_model.py
+# 追蹤框的等速度卡爾曼濾波（cv2.KalmanFilter）：狀態為框的中心、寬高與各自的速度，量測值為追蹤器回傳的框
+# predict 預測下一幀框的位置（追丟後的搜尋範圍以預測的位置為中心），correct 回傳平滑過的框（放大畫面使用，不會逐幀抖動）
+import cv2
+import numpy as np
+
+
+# (x, y, w, h) <-> (中心 x, 中心 y, w, h)
+def _to_center(bbox):
+    x, y, w, h = (float(v) for v in bbox)
+    return np.array([[x + w / 2], [y + h / 2], [w], [h]], dtype=np.float32)
+
+
+def _to_box(state):
+    cx, cy, w, h = (float(v) for v in state[:4, 0])
+    w, h = max(w, 1.0), max(h, 1.0)
+    return cx - w / 2, cy - h / 2, w, h
+
+
+class KalmanBox:
+    def __init__(self, bbox, process_noise=1.0, measurement_noise=16.0):
+        # 狀態 (cx, cy, w, h, vx, vy, vw, vh)，每一幀位置加上速度，速度不變
+        self.kalman = cv2.KalmanFilter(8, 4)
+        self.kalman.transitionMatrix = np.eye(8, dtype=np.float32) + np.eye(8, k=4, dtype=np.float32)
+        self.kalman.measurementMatrix = np.eye(4, 8, dtype=np.float32)
+        self.kalman.processNoiseCov = np.eye(8, dtype=np.float32) * process_noise
+        # 量測雜訊越大，平滑的效果越強、反應越慢（單位為像素的平方）
+        self.kalman.measurementNoiseCov = np.eye(4, dtype=np.float32) * measurement_noise
+        self.reset(bbox)
+
+    # 以 bbox 重新開始（速度歸零），例如重新圈選或以偵測框重新初始化追蹤器時
+    def reset(self, bbox):
+        state = np.zeros((8, 1), dtype=np.float32)
+        state[:4] = _to_center(bbox)
+        self.kalman.statePre = state.copy()
+        self.kalman.statePost = state
+        # 位置一開始就很確定，速度完全不知道
+        self.kalman.errorCovPost = np.diag([1, 1, 1, 1, 100, 100, 100, 100]).astype(np.float32)
+        self.box = _to_box(state)  # 目前估計的框 (x, y, w, h)
+
+    # 預測下一幀框的位置（每一幀呼叫一次，在 correct 之前）
+    def predict(self):
+        self.box = _to_box(self.kalman.predict())
+        return self.box
+
+    # 以追蹤器回傳的框修正估計，回傳平滑過的框
+    def correct(self, bbox):
+        self.box = _to_box(self.kalman.correct(_to_center(bbox)))
+        return self.box
@@ -0,0 +1,65 @@
+# multi_tracker.py
+# 同時追蹤多個目標：每個 ROI 有自己的追蹤器，每一幀在執行緒池中同時更新（OpenCV 在 update 期間會釋放 GIL），
+# 全部完成後合併結果再交給畫面繪製；每幀的追蹤時間取決於核心數，而不是目標數量
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class MultiTracker:
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.targets = {}  # 目標編號 -> 追蹤器（tracker_registry.TimedTracker）
+        self.next_id = 0
+        self.frames = 0  # 已更新的幀數
+        self.total_time = 0.0  # 累計每一幀更新所有目標的時間（秒）
+        self.last_time = 0.0
+        self._pool = None  # 第一次有兩個以上的目標時才建立
+
+    def __len__(self):
+        return len(self.targets)
+
+    # 以 frame 上的 bbox (x, y, w, h) 初始化追蹤器並加入，回傳目標編號
+    def add(self, tracker, frame, bbox):
+        tracker.init(frame, bbox)
+        target_id = self.next_id
+        self.next_id += 1
+        self.targets[target_id] = tracker
+        return target_id
+
+    def remove(self, target_id):
+        self.targets.pop(target_id, None)
+
+    # 更新所有目標，回傳 [(目標編號, 是否成功, bbox), ...]，順序與加入的順序相同
+    def update(self, frame):
+        start = time.perf_counter()
+        items = list(self.targets.items())
+        if len(items) == 1 or self.max_workers == 1:
+            results = [(target_id, *tracker.update(frame)) for target_id, tracker in items]
+        else:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tracker")
+            futures = [(target_id, self._pool.submit(tracker.update, frame)) for target_id, tracker in items]
+            results = [(target_id, *future.result()) for target_id, future in futures]
+        self.last_time = time.perf_counter() - start
+        self.total_time += self.last_time
+        self.frames += 1
+        return results
+
+    def clear(self):
+        self.targets = {}
+
+    def shutdown(self):
+        self.clear()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def stats(self):
+        return {
+            "targets": len(self.targets),
+            "workers": self.max_workers,
+            "frames": self.frames,
+            "avg_ms": round(self.total_time / self.frames * 1000, 3) if self.frames else 0.0,
+            "last_ms": round(self.last_time * 1000, 3),
+        }
@@ -2,10 +2,25 @@
 import cv2  # 視頻處理和數據處理
 import numpy as np  # 視頻處理和數據處理
 from PyQt5.QtCore import Qt, QEvent, QRect
-from PyQt5.QtGui import QImage, QPixmap, QPainter  # 圖像處理和顯示
-from PyQt5.QtWidgets import QFileDialog  # 顯示文件對話框
+from PyQt5.QtGui import QKeySequence  # 鍵盤快捷鍵
+from PyQt5.QtWidgets import QFileDialog, QShortcut  # 顯示文件對話框
 from datetime import timedelta  # 時間計算
-from ui import VideoPlayerUI  # 自定義的 GUI 類，視頻播放器的界面
+from decoder import open_capture, fit_size  # 可替換的解碼器後端（OpenCV / PyAV / ffmpeg）
+from frame_buffer import FrameReader  # 背景解碼執行緒與幀緩衝區
+from seek_index import SeekIndexBuilder, SEEK_ACCURATE, SEEK_KEYFRAME  # 關鍵幀索引，讓拖動進度條時可以快速跳轉
+from thumbnail_strip import ThumbnailStrip  # 拖動進度條時顯示的低解析度縮圖
+from frame_cache import FrameCache  # 最近解碼過的幀的 LRU 快取
+from presentation_clock import PresentationClock  # 依照每一幀的顯示時間排程播放
+from zoom_renderer import ZoomRenderer  # 放大畫面一次完成裁切與縮放
+from tracker_registry import create_tracker  # 可替換的追蹤器後端（CSRT / KCF / MOSSE / MIL / DNN）
+from multi_tracker import MultiTracker  # 多目標追蹤，每個 ROI 一個追蹤器，在執行緒池中同時更新
+from tracking_worker import TrackingWorker  # 在 GUI 執行緒之外執行追蹤，畫面只取用已完成的結果
+from hybrid_tracker import HybridTracker  # 每隔幾幀偵測一次並修正追蹤框
+from detector import Detector, load_labels  # YOLOv4-tiny 物件偵測
+from loss_recovery import RecoveringTracker  # 追丟後在最後的位置周圍搜尋並重新初始化追蹤器
+from detection_cache import DetectionCache, DetectionCacheBuilder, model_key, video_fingerprint  # 影片旁的偵測結果快取檔
+from track_store import MODE_REPLACE, TrackStore, TrackStoreWriter, track_path  # 影片旁的追蹤結果檔（.tracks），拖動進度條時直接畫出之前的追蹤框
+from ui4 import VideoPlayerUI  # 自定義的 GUI 類，視頻播放器的界面
 
 # 定義了 VideoPlayer 類，它繼承自 VideoPlayerUI
 class VideoPlayer(VideoPlayerUI):
@@ -15,12 +30,33 @@ class VideoPlayer(VideoPlayerUI):
         self.showMaximized()  # 確保在窗口顯示時它是最大化的
         self.setFixedSize(self.size())
         self.vid = None  # 存儲視頻捕獲對象
+        self.video_source = None  # 影片資料路徑
+        self.decoder_backend = None  # 目前這個檔案使用的解碼器後端，None 表示依副檔名自動選擇
+        self.decode_at_display_size = True  # 沒有追蹤時讓解碼器直接輸出顯示大小的幀
+        self.decode_size = None  # 目前要求解碼器輸出的大小，None 表示原始解析度
+        self.frame_size = (0, 0)  # 影片的原始大小 (寬, 高)
+        self.reader = None  # 背景解碼執行緒，預先把幀解碼到緩衝區
+        self.buffer_depth = 8  # 緩衝區最多保留幾個已解碼的幀
+        self.buffer_policy = "block"  # 緩衝區滿時的策略："block" 等待 / "drop" 丟棄最舊的幀
+        self.seek_index = None  # 關鍵幀與時間戳索引，開啟影片後在背景建立
+        self.thumbnails = None  # 縮圖條，索引建立完成後在背景解碼
+        self.frame_cache = FrameCache(256 * 1024 * 1024)  # 逐幀前進 / 後退、小幅倒轉時直接從快取取幀
+        self.rewind_step = 10  # Shift + 左鍵一次倒轉的幀數
         self.timer = None  # 定時更新視頻幀
         self.current_frame = 0  # 記錄當前視頻幀
         self.total_frames = 0  # 記錄視頻的總幀數
         self.fps = 0  # 記錄視頻的幀率（每秒幀數）
-        self.tracker = None  # 跟踪對象
-        self.roi = None  # 記錄感興趣區域（Region of Interest, ROI）
+        self.clock = None  # 播放時鐘，依照幀的時間戳決定何時顯示、何時丟幀
+        self.zoom_renderer = ZoomRenderer()  # 放大畫面的繪製（可選擇插值方式，並統計每幀的時間）
+        self.trackers = MultiTracker()  # 跟踪對象（每個 ROI 一個追蹤器）
+        self.tracking_worker = None  # 背景追蹤執行緒，開始追蹤時建立，直接從解碼執行緒接收幀
+        self.detector = None  # 混合模式使用的偵測器，第一次使用時才載入
+        self.detection_cache = None  # 目前影片每一幀的偵測結果（勾選 Detect 時在背景建立或從快取檔讀取）
+        self.cache_builder = None  # 在背景把偵測結果填進快取的執行緒
+        self.video_hash = None  # 影片內容的雜湊，用來確認 .tracks 檔是這部影片的
+        self.track_store = None  # 之前追蹤的結果（track_store.TrackStore），沒有追蹤時畫出來
+        self.track_writer = None  # 追蹤時把每一幀的結果寫入 .tracks 檔
+        self.rois = []  # 已圈選、按下 Play 時才開始追蹤的感興趣區域（Region of Interest, ROI），video_surface 上的座標
         self.tracking = False  # 標識是否正在跟踪對象
 
         self.zoom_window.setGeometry(QRect(100, 100, 640, 480))
@@ -31,8 +67,6 @@ class VideoPlayer(VideoPlayerUI):
         # 圈選的起始點和結束點
         self.start_x = None
         self.start_y = None
-        self.rect = None
-        self.scaled_pixmap = None
 
         # 連接控件事件
         self.play_button.clicked.connect(self.play_video)
@@ -40,7 +74,15 @@ class VideoPlayer(VideoPlayerUI):
         self.reset_button.clicked.connect(self.reset)
         self.clear_button.clicked.connect(self.clear_trace)
         self.progress_slider.sliderMoved.connect(self.on_progress_move)
+        self.progress_slider.sliderReleased.connect(self.on_progress_release)
         self.open_file_button.clicked.connect(self.open_file_dialog)
+        self.detect_check.toggled.connect(self.on_detect_toggled)
+
+        # 鍵盤快捷鍵：左 / 右鍵逐幀後退 / 前進，Shift + 左 / 右鍵一次移動 rewind_step 幀
+        QShortcut(QKeySequence(Qt.Key_Right), self, lambda: self.step_frame(1))
+        QShortcut(QKeySequence(Qt.Key_Left), self, lambda: self.step_frame(-1))
+        QShortcut(QKeySequence(Qt.SHIFT + Qt.Key_Right), self, lambda: self.step_frame(self.rewind_step))
+        QShortcut(QKeySequence(Qt.SHIFT + Qt.Key_Left), self, lambda: self.step_frame(-self.rewind_step))
 
     def open_file_dialog(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Open Video File", "", "Video Files (*.mp4 *.avi *.mov *.mkv *.flv *.wmv)")
@@ -50,122 +92,358 @@ class VideoPlayer(VideoPlayerUI):
     # 打開一個新視頻文件並進行初始化，根據視頻文件設置幀數、FPS、總時長等參數，並設置進度條的範圍，最後啟動一個計時器來控制視頻的播放
     def open_file(self, file_path):
         self.pause_video()
+        self.stop_reader()
+        self.stop_thumbnails()
+        self.stop_detection_cache()
+        self.clear_frame_cache()
         if self.vid:
             self.vid.release()
-        self.vid = cv2.VideoCapture(file_path)
+        self.video_source = file_path
+        self.video_hash = video_fingerprint(file_path)
+        # 每個檔案開啟時依照 decoder_combo 的選擇決定解碼器後端
+        backend = self.decoder_combo.currentText()
+        self.decoder_backend = None if backend == "auto" else backend
+        self.vid = open_capture(file_path, self.decoder_backend)
         self.current_frame = 0
         self.total_frames = int(self.vid.get(cv2.CAP_PROP_FRAME_COUNT))
         self.fps = self.vid.get(cv2.CAP_PROP_FPS)
+        self.frame_size = (int(self.vid.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.vid.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self.seek_index = None
+        self.start_reader()
+        # 在背景建立（或從影片旁的 .seekidx.npz 讀取）關鍵幀索引
+        SeekIndexBuilder(file_path, lambda index, path=file_path: self.on_seek_index_ready(path, index)).start()
         self.total_duration = timedelta(seconds=int(self.total_frames / self.fps))
         self.progress_slider.setMaximum(self.total_frames)
-        self.tracker = None
-        self.roi = None
+        self.stop_trackers()
+        self.rois = []
+        if self.detect_check.isChecked():
+            self.start_detection_cache()
         if self.timer:
             self.timer.stop()
-        # 根據 FPS 計算計時器的間隔時間，並啟動一個新的計時器 (每一幀需要多少毫秒來顯示)
-        self.timer = self.startTimer(int(1000 / self.fps))
+        self.clock = PresentationClock(self.fps)
+        # 啟動計時器；計時器只負責定期檢查，每一幀何時顯示由播放時鐘依照時間戳決定
+        self.timer = self.startTimer(self.clock.tick_interval(), Qt.PreciseTimer)
+
+    # 啟動背景解碼執行緒，之後 self.vid 只能由 self.reader 存取
+    def start_reader(self, start_frame=0):
+        self.reader = FrameReader(self.vid, self.buffer_depth, self.buffer_policy, start_frame)
+        self.reader.seek_index = self.seek_index
+        self.reader.cache = self.frame_cache
+        if self.tracking:
+            self.reader.tracking_worker = self.tracking_worker
+        self.decode_size = None
+        self.reader.start()
+        self.update_decode_size()
+
+    # 沒有追蹤時讓解碼器直接輸出 video_surface 大小的幀，省掉原始解析度的色彩轉換和縮放
+    # 追蹤時追蹤器和放大畫面需要原始解析度，改回原始大小；大小改變時從目前的位置重新解碼
+    def update_decode_size(self):
+        if not self.reader:
+            return
+        size = None
+        if self.decode_at_display_size and not ((self.trackers or self.rois) and self.tracking):
+            size = fit_size(self.frame_size, (self.video_surface.width(), self.video_surface.height()))
+        if size != self.decode_size:
+            self.decode_size = size
+            self.reader.set_output_size(size, self.current_frame)
+
+    # 視窗大小改變時重新決定解碼輸出的大小
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if hasattr(self, "reader"):
+            self.update_decode_size()
+
+    # 索引建立完成（在背景執行緒中被呼叫），只做屬性設定；若這段期間已經換了影片就忽略
+    def on_seek_index_ready(self, path, index):
+        if path == self.video_source:
+            self.seek_index = index
+            if self.reader:
+                self.reader.seek_index = index
+            # 有索引時縮圖只需要解碼關鍵幀
+            self.thumbnails = ThumbnailStrip(path, seek_index=index, backend=self.decoder_backend)
+            self.thumbnails.start()
+
+    def stop_thumbnails(self):
+        if self.thumbnails:
+            self.thumbnails.stop()
+            self.thumbnails = None
+
+    # 丟掉目前所有的追蹤器，並印出每一幀的平均時間；追蹤的結果已經寫入 .tracks 檔，重新讀取後之後拖動進度條時還看得到
+    def stop_trackers(self):
+        if self.reader:
+            self.reader.tracking_worker = None
+        if self.tracking_worker:
+            self.tracking_worker.stop()
+            if self.tracking_worker.skipped:
+                print(f"Tracking worker skipped {self.tracking_worker.skipped} frames")
+            self.tracking_worker = None
+        if self.track_writer:
+            self.track_store = None  # 關閉時會改寫檔案（刪掉這次重新追蹤的範圍內的舊紀錄），先放掉 memmap
+            self.track_writer.close()
+            print(f"Track store: {self.track_writer.rows} records written to {self.track_writer.path}")
+            self.track_writer = None
+        self.load_track_store()
+        self.tracking_label.setText("")
+        if self.trackers.frames:
+            for target_id, tracker in self.trackers.targets.items():
+                print(f"Tracker {target_id}: {tracker.stats()}")
+            print(f"Tracking: {self.trackers.stats()}")
+        self.trackers.shutdown()
+        self.trackers = MultiTracker()
+
+    # 讀取目前影片的 .tracks 檔（沒有時為 None）
+    def load_track_store(self):
+        self.track_store = TrackStore.load(track_path(self.video_source), self.video_hash) if self.video_source else None
+
+    # 開始追蹤時開啟 .tracks 檔，新的紀錄附加在後面，停止追蹤時取代之前在同一段幀範圍內的紀錄；影片所在的資料夾不能寫入時不記錄
+    def open_track_writer(self):
+        self.track_store = None  # 開啟寫入前先放掉 memmap（可能需要截掉寫到一半的紀錄）
+        try:
+            self.track_writer = TrackStoreWriter(track_path(self.video_source), self.video_hash, mode=MODE_REPLACE)
+        except OSError as e:
+            print(f"Track store unavailable ({e})")
+            self.track_writer = None
+        return self.track_writer
+
+    # 沒有追蹤時，.tracks 檔中這一幀的追蹤框
+    def stored_boxes(self, frame_index):
+        if not self.track_store:
+            return []
+        return [bbox for _, bbox in self.track_store.boxes_at(frame_index)]
+
+    # 依照 detect_check 建立一般的多目標追蹤或偵測加追蹤的混合模式
+    def create_trackers(self):
+        if self.detect_check.isChecked() and self.load_detector():
+            return HybridTracker(self.detector, self.fps)
+        return MultiTracker()
+
+    # 載入偵測器（只載入一次）；沒有權重檔或 OpenCV 不支援時改為只追蹤
+    def load_detector(self):
+        if self.detector is None:
+            try:
+                self.detector = Detector()
+            except (OSError, RuntimeError, cv2.error) as e:
+                print(f"Detector unavailable ({e}), tracking without detection")
+                self.detect_check.setChecked(False)
+        return self.detector
+
+    # 勾選 Detect 時開始建立（或讀取）偵測結果快取，取消勾選時停止
+    def on_detect_toggled(self, checked):
+        if checked:
+            self.start_detection_cache()
+        else:
+            self.stop_detection_cache()
+
+    # 讀取影片旁的偵測結果快取檔，還沒偵測過的幀在背景以批次偵測補上；之後播放、拖動進度條、重新開啟都不需要再推論
+    # 快取檔名只需要模型設定，不需要載入網路；快取已經完整時不建立偵測器
+    def start_detection_cache(self):
+        if not self.video_source or self.detection_cache:
+            return
+        try:
+            key, labels = model_key(), load_labels()
+        except OSError as e:
+            print(f"Detector unavailable ({e}), tracking without detection")
+            self.detect_check.setChecked(False)
+            return
+        cache = DetectionCache.load(self.video_source, key, self.total_frames, labels)
+        if not cache.complete:
+            try:
+                detector = Detector()  # 背景執行緒使用自己的網路，不和混合模式的偵測器共用
+            except (OSError, RuntimeError, cv2.error) as e:
+                print(f"Detector unavailable ({e}), tracking without detection")
+                self.detect_check.setChecked(False)
+                return
+            self.cache_builder = DetectionCacheBuilder(self.video_source, detector, cache, self.decoder_backend)
+            self.cache_builder.start()
+        self.detection_cache = cache
+
+    # 停止背景偵測，等執行緒把目前的結果存檔後才結束（最多等目前這一批偵測完）
+    def stop_detection_cache(self):
+        if self.cache_builder:
+            self.cache_builder.stop()
+            self.cache_builder.join()
+            self.cache_builder = None
+        self.detection_cache = None
+
+    # 快取中這一幀的偵測結果；沒有勾選 Detect 或這一幀還沒偵測過時不畫
+    def cached_detections(self, frame_index):
+        if not self.detection_cache or not self.detect_check.isChecked():
+            return ()
+        return self.detection_cache.get(frame_index) or ()
+
+    def stop_reader(self):
+        if self.reader:
+            self.reader.stop()
+            self.reader = None
 
-    # 當計時器事件觸發時，方法會被調用會呼叫 update_frame 方法來更新視頻幀的顯示
+    # 當計時器事件觸發時，方法會被調用會呼叫 present_due_frame 方法來顯示已經到時間的幀
     def timerEvent(self, event):
-        self.update_frame()
+        self.present_due_frame()
+
+    # 依照播放時鐘顯示已經到顯示時間的幀，處理時間的長短不會影響播放速度
+    # 如果下一幀也已經到時間（解碼加追蹤跟不上），目前這一幀直接丟掉不顯示
+    def present_due_frame(self):
+        if not self.reader or self.progress_slider.isSliderDown():
+            return
+        decoded = self.reader.peek()
+        while decoded is not None:
+            if self.clock.delay(decoded.timestamp) > 0:
+                return  # 還沒到顯示時間
+            self.reader.read()
+            upcoming = self.reader.peek()
+            if upcoming is not None and self.clock.delay(upcoming.timestamp) <= 0:
+                self.clock.frame_dropped()
+                decoded = upcoming
+                continue
+            self.clock.frame_presented(decoded.timestamp)
+            self.display_frame(decoded.index, decoded.image)
+            return
 
     # 更新視頻播放中的每一幀並進行相關處理 (從視頻流中讀取幀數，進行跟蹤、顯示處理，並更新進度條和時間顯示)
-    def update_frame(self):
-        # 檢查視頻文件是否已經打開並且可以進行讀取
-        if self.vid and self.vid.isOpened():
-            # 使用 read() 方法從視頻中讀取下一幀。ret 是一個布林值，表示讀取是否成功。frame 是讀取到的幀數據（圖像）
-            ret, frame = self.vid.read()
-            # 檢查幀讀取是否成功
-            if ret:
-                # 檢查是否有啟動目標跟蹤（tracker）並且跟蹤狀態（tracking）為真
-                if self.tracker and self.tracking:
-                    self.process_tracking(frame)
-
-                # 將幀從 BGR 色彩空間轉換為 RGB 色彩空間
-                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                # 將 RGB 幀轉換為 PyQt5 的 QImage 對象
-                image = self.convert_to_qimage(frame)
-                # 先將 QImage 轉換為 QPixmap
-                pixmap = QPixmap.fromImage(image)
-
-                # 等比例縮放 QPixmap，以適應 video_label 的大小
-                self.scaled_pixmap = pixmap.scaled(self.video_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                # 將縮放後的圖像設置為 video_label 的顯示內容，使圖像顯示在界面上
-                self.video_label.setPixmap(self.scaled_pixmap)
-  
-                # 更新進度條和時間標籤
-                self.update_ui()
-
-    def process_tracking(self, frame):
-        success, bbox = self.tracker.update(frame)
-        if success:
-            p1 = (int(bbox[0]), int(bbox[1]))
-            p2 = (int(bbox[0] + bbox[2]), int(bbox[1] + bbox[3]))
-            cv2.rectangle(frame, p1, p2, (255, 0, 0), 2, 1)
-            zoomed_frame = frame[p1[1]:p2[1], p1[0]:p2[0]]
-            zoomed_frame = cv2.cvtColor(zoomed_frame, cv2.COLOR_BGR2RGB)
-            zoomed_image = self.convert_to_qimage(zoomed_frame)
-            self.show_zoomed_image(zoomed_image)
-
-    def update_ui(self):
-        self.current_frame = int(self.vid.get(cv2.CAP_PROP_POS_FRAMES))
+    def update_frame(self, block=False):
+        # 檢查背景解碼執行緒是否已經啟動；拖動進度條期間畫面顯示的是縮圖，暫時不取出新的幀
+        if self.reader and not self.progress_slider.isSliderDown():
+            # 從緩衝區取出下一個已解碼的幀，解碼還沒跟上時回傳 None，這次計時器事件就直接跳過，不會卡住事件循環
+            decoded = self.reader.read(block=block, timeout=0.5)
+            # 檢查是否取得幀
+            if decoded:
+                self.display_frame(decoded.index, decoded.image)
+
+    # 對一個幀做追蹤、顯示處理，並更新進度條和時間顯示（幀可能來自解碼執行緒或快取）
+    def display_frame(self, frame_index, frame):
+        # 檢查是否有啟動目標跟蹤（trackers）並且跟蹤狀態（tracking）為真；沒有追蹤時畫出 .tracks 檔中之前追蹤的結果
+        if self.trackers and self.tracking and self.tracking_worker:
+            boxes = self.tracked_boxes(frame_index, frame)
+        else:
+            boxes = self.stored_boxes(frame_index)
+
+        # 交給 video_surface 顯示：BGR 陣列直接包成 QImage，需要時等比例縮放到顯示區域的大小
+        # 追蹤框和快取中的偵測框畫在覆蓋圖層上，不修改快取中共用的幀，也不需要先複製一份
+        self.video_surface.show_frame(frame, boxes, self.cached_detections(frame_index), self.frame_size)
+
+        # 更新進度條和時間標籤
+        self.update_ui(frame_index)
+
+    # 從快取中顯示指定的幀，並讓解碼執行緒從下一幀繼續；快取中沒有時回傳 False
+    def show_cached_frame(self, frame_index):
+        frame = self.frame_cache.get(frame_index)
+        if frame is None:
+            return False
+        self.display_frame(frame_index, frame)
+        # 解碼執行緒接下來本來就會讀到下一幀時不跳轉（跳轉會清掉預讀的幀）
+        if not self.reader or self.reader.next_index() != frame_index + 1:
+            self.seek_reader(frame_index + 1)
+        return True
+
+    # 讓解碼執行緒跳轉，播放時鐘重新以跳轉後的第一幀為基準
+    def seek_reader(self, frame_index, mode=SEEK_ACCURATE):
+        if self.reader:
+            self.reader.seek(frame_index, mode)
+        if self.tracking_worker:
+            self.tracking_worker.reset()
+        if self.clock:
+            self.clock.stop()
+
+    # 逐幀前進 / 後退（delta 可以是負數），優先從快取取幀，快取沒有時才交給解碼器跳轉
+    def step_frame(self, delta):
+        if not self.reader:
+            return
+        self.pause_video()
+        target = min(max(self.current_frame - 1 + delta, 0), max(self.total_frames - 1, 0))
+        if not self.show_cached_frame(target):
+            self.seek_reader(target)
+            self.update_frame(block=True)
+
+    def clear_frame_cache(self):
+        if self.frame_cache.hits or self.frame_cache.misses:
+            print(f"Frame cache: {self.frame_cache.stats()}")
+        if self.clock and self.clock.presented:
+            print(f"Playback: {self.clock.stats()}")
+        if self.video_surface.display_path.frames:
+            print(f"Display: {self.video_surface.display_path.stats()}")
+        if self.zoom_renderer.frames:
+            print(f"Zoom: {self.zoom_renderer.stats()}")
+        self.frame_cache.clear()
+        self.frame_cache.hits = 0
+        self.frame_cache.misses = 0
+
+    # 取出背景追蹤執行緒對這一幀（或之前最新一幀）的結果並顯示追蹤延遲
+    # 放大畫面顯示第一個追蹤成功的目標，使用卡爾曼濾波平滑過的框，不會跟著追蹤框逐幀抖動；
+    # 全部追丟時顯示第一個目標預測的位置，放大畫面沿著預測的方向繼續移動
+    def tracked_boxes(self, frame_index, frame):
+        result = self.tracking_worker.result_for(frame_index)
+        if result is None:
+            self.tracking_label.setText("tracking...")
+            return []
+        self.tracking_label.setText(f"lag: {frame_index - result.index} frames")
+        boxes = [bbox for _, bbox in result.boxes]
+        target_id = result.boxes[0][0] if result.boxes else next(iter(result.smoothed), None)
+        if target_id is not None:
+            self.show_zoomed_image(frame, result.smoothed[target_id])
+        return boxes
+
+    def update_ui(self, frame_index):
+        # 與 CAP_PROP_POS_FRAMES 相同的意義：下一個要播放的幀號
+        self.current_frame = frame_index + 1
         self.progress_slider.setValue(self.current_frame)
         current_time = timedelta(seconds=int(self.current_frame / self.fps))
         time_str = f"{str(current_time)[:7]} / {str(self.total_duration)[:7]}"
         self.time_label.setText(time_str)
+        if self.clock:
+            # 滑鼠停在時間標籤上時顯示遲到 / 丟掉的幀數
+            self.time_label.setToolTip(f"late: {self.clock.late}, dropped: {self.clock.dropped}")
+
 
-    
-    #　將 OpenCV 的影像幀轉換為 PyQt5 的 QImage，以便在 PyQt5 的 GUI 中顯示
-    def convert_to_qimage(self, frame):
-        # 從影像幀中獲取其高度（height）、寬度（width）以及色彩通道數量（channel）
-        height, width, channel = frame.shape
-        # 計算每行像素佔用的位元組數（這裡每個像素佔用 3 個位元組，對應於 RGB 三個色彩通道）
-        bytes_per_line = 3 * width
-        # 將 OpenCV 的影像幀轉換為 PyQt5 的 QImage 對象
-        # 影像幀的原始資料，影像的寬度，影像的高度，每行的位元組數，指定 QImage 的格式
-        q_image = QImage(frame.data, width, height, bytes_per_line, QImage.Format_RGB888)
-        #返回轉換後的 QImage 對象，這個對象可以直接用於在 PyQt5 的介面中顯示
-        return q_image
-
-    # 用來在一個單獨的視窗中顯示放大的影像
-    def show_zoomed_image(self, image):
-        width = image.width()
-        height = image.height()
+    # 用來在一個單獨的視窗中顯示放大的影像：追蹤框的範圍直接裁切並縮放成 zoom_label 的大小
+    def show_zoomed_image(self, frame, bbox):
         self.zoom_label.resize(self.widget.size())
-        ratio = min(self.zoom_label.width() / width, self.zoom_label.height() / height)
-        new_image = image.scaled(int(width * ratio), int(height * ratio), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.zoom_label.setPixmap(QPixmap.fromImage(new_image))  # 将传入的 image 图像设置为 zoom_label 中显示的内容。 
+        zoomed_frame = self.zoom_renderer.render(frame, bbox, (self.zoom_label.width(), self.zoom_label.height()))
+        self.zoom_label.show_frame(zoomed_frame)  # 将传入的 image 图像设置为 zoom_label 中显示的内容。 
 
     # 控制影片的播放
     def play_video(self):
         if self.vid and not self.vid.isOpened():  # 检查 self.vid 是否存在并有效。 如果视频文件未成功打开，后续操作（如启动定时器播放视频）将没有意义。
-            self.vid = cv2.VideoCapture(self.video_source)
-            self.vid.set(cv2.CAP_PROP_POS_FRAMES, self.current_frame)
-        if self.roi and self.roi[2] and self.roi[3]:
-            self.tracker = cv2.TrackerCSRT_create()
-            ret, frame = self.vid.read()
-            if ret:
-                print(f"ROI: x={self.roi[0]}, y={self.roi[1]}, width={self.roi[2]}, height={self.roi[3]}")
+            self.stop_reader()
+            self.vid = open_capture(self.video_source, self.decoder_backend)
+            self.start_reader(self.current_frame)
+        if self.rois and self.reader:
+            if not self.trackers:
+                # 第一批目標：依目前的設定決定是否使用偵測加追蹤
+                self.stop_trackers()
+                self.trackers = self.create_trackers()
+            # 追蹤執行緒先接上解碼執行緒，初始化之後解碼的幀都會交給它（執行緒在初始化完成後才開始處理）
+            if not self.tracking_worker:
+                self.tracking_worker = TrackingWorker(self.trackers, self.buffer_depth * 2)
+                self.tracking_worker.store = self.open_track_writer()
+            self.reader.tracking_worker = self.tracking_worker
+            # 追蹤器需要原始解析度的幀
+            self.update_decode_size()
+            decoded = self.reader.read(block=True, timeout=1.0)
+            if decoded:
+                frame = decoded.image
                 print(f"Image size: width={frame.shape[1]}, height={frame.shape[0]}")
                 if len(frame.shape) == 2 or frame.shape[2] == 1:
                     frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
-                window_size = self.size()
-                width = window_size.width()
-                height = window_size.height()
-                scale_width = frame.shape[1] / width
-                scale_height = frame.shape[0] / height
-                x = int(self.roi[0] * (scale_width))
-                y = int(self.roi[1] * (scale_height))
-                w = int(self.roi[2] * (scale_width))
-                h = int(self.roi[3] * (scale_height))
-                new_roi = (x,y,w,h)
-
-                self.tracker.init(frame, new_roi)
-                self.zoom_window.show()
-        self.rect = None
+                # 每個新圈選的 ROI 依照 tracker_combo 的選擇建立自己的追蹤器，之前的目標繼續追蹤
+                for roi in self.rois:
+                    print(f"ROI: x={roi[0]}, y={roi[1]}, width={roi[2]}, height={roi[3]}")
+                    # ROI 是 video_surface 上的座標，經過影像的目標區域換算成原始幀的座標（扣掉上下或左右的黑邊）
+                    new_roi = self.video_surface.map_to_frame(roi, (frame.shape[1], frame.shape[0]))
+                    if new_roi and new_roi[2] and new_roi[3]:
+                        tracker = create_tracker(self.tracker_combo.currentText(), self.resolution_combo.currentText())
+                        # 追丟時先以樣板比對、再以偵測器（有載入時）找回目標，每幀的搜尋時間不超過一幀的時間
+                        tracker = RecoveringTracker(tracker, self.detector, budget=1.0 / self.fps)
+                        target_id = self.trackers.add(tracker, frame, new_roi)
+                        if self.track_writer:
+                            self.track_writer.append(decoded.index, [(target_id, True, new_roi)])
+                if self.trackers:
+                    self.tracking_worker.start_from(decoded.index)
+                    self.zoom_window.show()
+            self.rois = []
+        self.video_surface.clear_selections()
         
         if self.vid and self.vid.isOpened() and not self.timer:  # 当前是否没有正在运行的定时器，防止重复启动定时器
-            self.timer = self.startTimer(int(1000 / self.fps))  #  启动一个定时器来控制视频帧的播放，并将定时器的 ID 保存到 self.timer
+            self.timer = self.startTimer(self.clock.tick_interval(), Qt.PreciseTimer)  #  启动一个定时器来控制视频帧的播放，并将定时器的 ID 保存到 self.timer
 
     # 暫停影片的播放
     def pause_video(self):
@@ -175,20 +453,35 @@ class VideoPlayer(VideoPlayerUI):
             self.killTimer(self.timer)
             # 將 self.timer 設置為 None，表示計時器已經停止且無效
             self.timer = None
+        if self.clock:
+            # 停止播放時鐘，繼續播放時以第一個顯示的幀重新計時
+            self.clock.stop()
         self.tracking = False
+        if self.reader:
+            # 暫停後不再把幀交給追蹤執行緒
+            self.reader.tracking_worker = None
         self.start_x = None
         self.start_y = None
-        self.rect = None
+        # 停止追蹤後改回顯示大小的解碼
+        self.update_decode_size()
+        # 把目前為止的追蹤結果寫入 .tracks 檔並重新讀取，暫停時逐幀前進 / 後退也看得到追蹤框
+        if self.track_writer:
+            self.track_writer.flush()
+            self.load_track_store()
 
     # 重置影片播放器的狀態，使其恢復到初始狀態
     def reset(self):
         # 暫停影片播放
         self.pause_video()
+        self.stop_reader()
+        self.stop_thumbnails()
+        self.stop_detection_cache()
+        self.clear_frame_cache()
         if self.vid:
             # 釋放影片資源，關閉與影片相關的文件或設備，並釋放內存
             self.vid.release()
-        # 清除影片顯示區域（video_label）的內容，使其變為空白
-        self.video_label.clear()
+        # 清除影片顯示區域（video_surface）的內容，使其變為空白
+        self.video_surface.clear()
         # 將進度條（progress_slider）的值設置為 0
         self.progress_slider.setValue(0)
         # 將時間標籤（time_label）的文本設置為 "00:00 / 00:00"
@@ -197,73 +490,88 @@ class VideoPlayer(VideoPlayerUI):
         self.zoom_window.hide()
         self.vid = None
         self.video_source = None
+        self.video_hash = None
+        self.seek_index = None
         self.current_frame = 0
         self.total_frames = 0
         self.fps = 0
+        self.clock = None
         self.delay = 0
         self.total_duration = timedelta(0)
-        self.tracker = None
-        self.rect = None
-        self.roi = None
+        self.stop_trackers()
+        self.rois = []
         self.tracking = False
 
     # 重置與目標追蹤（tracking）相關的狀態和數據
     def clear_trace(self):
         # 暫停影片播放
-        # 將 self.tracker 設置為 None，表示取消當前的目標追蹤器
+        # 清除所有目標的追蹤器
         # (清除先前設置的追蹤器，防止它繼續嘗試在影片中追蹤目標)
-        self.tracker = None
-        # 將 self.roi 設置為 None，表示清除當前的感興趣區域（Region of Interest）
-        self.roi = None
+        self.stop_trackers()
+        # 清除所有還沒開始追蹤的感興趣區域（Region of Interest）
+        self.rois = []
         # 將 self.tracking 設置為 False，表示關閉目標追蹤功能
         self.tracking = False
         self.zoom_window.hide()
         self.start_x = None
         self.start_y = None
-        self.rect = None
-        self.update_frame()
+        self.video_surface.clear_selections()
+        self.update_decode_size()
+        # 重新顯示目前這一幀（去掉追蹤框），快取中有的話不需要經過解碼器
+        if not self.show_cached_frame(self.current_frame - 1):
+            self.update_frame(block=True)
 
     # 覆寫 closeEvent 方法
     def closeEvent(self, event):
         self.clear_trace()  # 在窗口關閉時調用 reset() 方法
+        self.stop_detection_cache()  # 背景偵測是 daemon 執行緒，關閉前先讓它存檔
         event.accept()  # 接受關閉事件
 
     # 在用戶拖動進度條時被調用，用來更新影片的播放位置
     def on_progress_move(self):
-        if self.vid:
-            # OpenCV 提供的 cv2.VideoCapture.set 方法來設置影片當前幀的位置。cv2.CAP_PROP_POS_FRAMES 是一個標誌，表示要設置的屬性是影片的幀位置
-            # 取得進度條當前的位置（值），表示用戶在進度條上選擇的新幀位置，通常是幀數，因此會直接傳給 cv2.set 方法來更新影片的播放位置
-            self.vid.set(cv2.CAP_PROP_POS_FRAMES, self.progress_slider.value())
+        if self.reader:
+            # 拖動期間優先顯示已經解碼好的縮圖，完全不需要跳轉
+            thumbnail = self.thumbnails.thumbnail(self.progress_slider.value()) if self.thumbnails else None
+            if thumbnail is not None:
+                self.show_thumbnail(self.progress_slider.value(), thumbnail)
+                return
+            # 縮圖還沒準備好時，交給背景解碼執行緒跳轉到新的幀位置，緩衝區中舊位置的幀會被清掉
+            # 拖動期間只跳到最近的關鍵幀，不必從關鍵幀往後解碼，每次拖動事件都能立即完成
+            self.seek_reader(self.progress_slider.value(), SEEK_KEYFRAME)
+
+    # 放開進度條時才精確跳轉到使用者選擇的幀
+    def on_progress_release(self):
+        if self.reader and not self.show_cached_frame(self.progress_slider.value()):
+            self.seek_reader(self.progress_slider.value(), SEEK_ACCURATE)
 
-    # 框選區域
+    # 把縮圖放大到 video_surface 的大小顯示，.tracks 檔中的追蹤框與快取中的偵測結果一起畫上
+    def show_thumbnail(self, frame_index, thumbnail):
+        self.video_surface.show_frame(thumbnail, self.stored_boxes(frame_index), self.cached_detections(frame_index),
+                                      self.frame_size)
+
+    # 框選區域（座標換算成 video_surface 上的座標）
     def mousePressEvent(self, event):
         self.pause_video()
         if event.button() == Qt.LeftButton:
-            self.start_x = event.x()
-            self.start_y = event.y()
+            pos = self.video_surface.mapFrom(self, event.pos())
+            self.start_x = pos.x()
+            self.start_y = pos.y()
 
+    # 拖動時只更新 video_surface 的圈選框圖層，不需要複製影像
     def mouseMoveEvent(self, event):
         if self.start_x is not None and self.start_y is not None:
-            end_x = event.x()
-            end_y = event.y()
-            self.rect = QRect(min(self.start_x, end_x), min(self.start_y, end_y), abs(end_x - self.start_x), abs(end_y - self.start_y))
-            self.update()
+            pos = self.video_surface.mapFrom(self, event.pos())
+            end_x = pos.x()
+            end_y = pos.y()
+            self.video_surface.set_selection(QRect(min(self.start_x, end_x), min(self.start_y, end_y), abs(end_x - self.start_x), abs(end_y - self.start_y)))
 
     def mouseReleaseEvent(self, event):
         if event.button() == Qt.LeftButton and self.start_x is not None and self.start_y is not None:
-            end_x = event.x()
-            end_y = event.y()
+            pos = self.video_surface.mapFrom(self, event.pos())
+            end_x = pos.x()
+            end_y = pos.y()
             if self.start_x != end_x and self.start_y != end_y:
-                self.rect = QRect(min(self.start_x, end_x), min(self.start_y, end_y), abs(end_x - self.start_x), abs(end_y - self.start_y))
-                self.roi = (min(self.start_x, end_x), min(self.start_y, end_y), abs(end_x - self.start_x), abs(end_y - self.start_y))
+                # 可以連續圈選多個 ROI，按下 Play 時一起開始追蹤
+                self.video_surface.add_selection(QRect(min(self.start_x, end_x), min(self.start_y, end_y), abs(end_x - self.start_x), abs(end_y - self.start_y)))
+                self.rois.append((min(self.start_x, end_x), min(self.start_y, end_y), abs(end_x - self.start_x), abs(end_y - self.start_y)))
                 self.tracking = True
-
-    def paintEvent(self, event):
-        super().paintEvent(event)
-        if self.rect:
-            paint_frame = self.scaled_pixmap.copy()
-            painter = QPainter(paint_frame)
-            painter.setPen(Qt.red)
-            painter.drawRect(self.rect)
-            painter.end()
-            self.video_label.setPixmap(paint_frame)
@@ -0,0 +1,54 @@
+# presentation_clock.py
+# 以單調時鐘（time.monotonic）依照每一幀的顯示時間（PTS）排程，而不是固定間隔的計時器
+# 解碼加追蹤來不及時，落後太多的幀會被丟掉，讓播放速度維持與影片一致
+import time
+
+
+class PresentationClock:
+    def __init__(self, fps, speed=1.0):
+        self.fps = fps or 30.0
+        self.speed = speed  # 播放速度倍率
+        self.frame_duration = 1.0 / self.fps
+        self.late_tolerance = self.frame_duration / 2  # 晚超過半幀才算「遲到」
+        self.drop_threshold = self.frame_duration  # 晚超過一幀而且後面已經有幀可顯示時就丟掉
+        self.presented = 0  # 已顯示的幀數
+        self.late = 0  # 顯示時已經遲到的幀數
+        self.dropped = 0  # 被丟掉沒有顯示的幀數
+        self._origin = None  # PTS 為 0 的幀應該顯示的時間點（time.monotonic）
+
+    @property
+    def running(self):
+        return self._origin is not None
+
+    # 以 pts 這一幀為基準，從現在開始計時
+    def start(self, pts):
+        self._origin = time.monotonic() - pts / self.speed
+
+    # 暫停或跳轉時停止，下一個顯示的幀會重新作為基準
+    def stop(self):
+        self._origin = None
+
+    # 距離 pts 這一幀應該顯示的時間還有幾秒（負數表示已經晚了）；時鐘還沒開始時以這一幀為基準
+    def delay(self, pts):
+        if self._origin is None:
+            self.start(pts)
+        return self._origin + pts / self.speed - time.monotonic()
+
+    # 這一幀是否已經晚到應該丟掉
+    def should_drop(self, pts):
+        return self.delay(pts) < -self.drop_threshold
+
+    def frame_presented(self, pts):
+        self.presented += 1
+        if self.delay(pts) < -self.late_tolerance:
+            self.late += 1
+
+    def frame_dropped(self):
+        self.dropped += 1
+
+    # 計時器間隔（毫秒）：每一幀檢查四次，顯示時間的誤差不超過四分之一幀
+    def tick_interval(self):
+        return max(1, int(self.frame_duration * 1000 / self.speed / 4))
+
+    def stats(self):
+        return {"presented": self.presented, "late": self.late, "dropped": self.dropped}
@@ -0,0 +1,77 @@
+# qt_display.py
+# Qt 顯示路徑：把解碼器輸出的 BGR NumPy 陣列直接包成 QImage（Format_BGR888，Qt 5.14 以上），不做 BGR -> RGB 的色彩轉換
+# 需要縮放時用 cv2.resize 寫入預先配置好的緩衝區，同時統計每一幀經過了幾次整張影像的複製
+import cv2
+import numpy as np
+from PyQt5.QtGui import QImage, QPixmap
+
+HAS_BGR888 = hasattr(QImage, "Format_BGR888")
+
+
+# 把 BGR 陣列包成 QImage，不複製資料；回傳的 QImage 直接使用 frame 的記憶體，
+# 使用期間呼叫端必須保留 frame 的參考（DisplayPath 會替它保留）
+def bgr_to_qimage(frame):
+    height, width = frame.shape[:2]
+    if HAS_BGR888:
+        return QImage(frame.data, width, height, frame.strides[0], QImage.Format_BGR888)
+    return QImage(frame.data, width, height, frame.strides[0], QImage.Format_RGB888).rgbSwapped()
+
+
+# 等比例放進 (寬, 高) 的大小（可放大也可縮小）
+def fit_into(frame_size, target_size):
+    frame_width, frame_height = frame_size
+    target_width, target_height = target_size
+    scale = min(target_width / frame_width, target_height / frame_height)
+    return max(1, int(frame_width * scale)), max(1, int(frame_height * scale))
+
+
+class DisplayPath:
+    def __init__(self, interpolation=cv2.INTER_AREA):
+        self.interpolation = interpolation  # 縮小時的插值方式，放大時使用 INTER_LINEAR
+        self.frame = None  # 目前顯示中的 QImage 所使用的陣列，保留參考讓記憶體在繪製期間有效
+        self.image = None
+        self.last_copies = 0  # 上一幀經過的整張影像複製次數
+        self.total_copies = 0
+        self.frames = 0
+        self._buffer = None  # 縮放用的緩衝區，大小改變時才重新配置
+
+    # 把 BGR 幀轉成 QImage；target_size 為顯示區域大小 (寬, 高)，None 表示不縮放
+    def to_qimage(self, frame, target_size=None):
+        copies = 0
+        if target_size:
+            size = fit_into((frame.shape[1], frame.shape[0]), target_size)
+            if size != (frame.shape[1], frame.shape[0]):
+                if self._buffer is None or self._buffer.shape[:2] != (size[1], size[0]):
+                    self._buffer = np.empty((size[1], size[0], 3), dtype=np.uint8)
+                interpolation = self.interpolation if size[0] < frame.shape[1] else cv2.INTER_LINEAR
+                cv2.resize(frame, size, dst=self._buffer, interpolation=interpolation)
+                frame = self._buffer
+                copies += 1
+        if not frame.flags["C_CONTIGUOUS"]:
+            frame = np.ascontiguousarray(frame)
+            copies += 1
+        if not HAS_BGR888:
+            copies += 1  # rgbSwapped() 會產生新的影像
+        self.frame = frame
+        self.image = bgr_to_qimage(frame)
+        self._count(copies)
+        return self.image
+
+    # 轉成 QPixmap（給 QLabel 顯示）；QPixmap.fromImage 會再複製一次
+    def to_pixmap(self, frame, target_size=None):
+        image = self.to_qimage(frame, target_size)
+        self.last_copies += 1
+        self.total_copies += 1
+        return QPixmap.fromImage(image)
+
+    def _count(self, copies):
+        self.last_copies = copies
+        self.total_copies += copies
+        self.frames += 1
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "copies_per_frame": self.total_copies / self.frames if self.frames else 0.0,
+            "last_copies": self.last_copies,
+        }
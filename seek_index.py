@@ -0,0 +1,173 @@
+# seek_index.py
+# 影片開啟時在背景建立關鍵幀（keyframe）與時間戳索引，並存成影片旁邊的 .seekidx.npz 檔案
+# 有了索引之後，拖動進度條時可以直接跳到關鍵幀（不需要解碼），放開時再從關鍵幀往後解碼到精確的幀
+import os
+import shutil
+import subprocess
+import threading
+
+import cv2
+import numpy as np
+
+INDEX_VERSION = 1
+
+SEEK_KEYFRAME = "keyframe"  # 直接跳到最近的關鍵幀，最快
+SEEK_ACCURATE = "accurate"  # 跳到目標幀之前的關鍵幀，再往後解碼到目標幀
+
+
+# 索引檔放在影片旁邊，例如 video.mp4 -> video.mp4.seekidx.npz
+def sidecar_path(video_path):
+    return video_path + ".seekidx.npz"
+
+
+class SeekIndex:
+    def __init__(self, keyframes, timestamps):
+        self.keyframes = np.asarray(keyframes, dtype=np.int64)  # 關鍵幀的幀號（遞增）
+        self.timestamps = np.asarray(timestamps, dtype=np.float64)  # 每一幀的顯示時間（秒）
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    # 目標幀之前（含）最近的關鍵幀
+    def keyframe_before(self, frame_index):
+        pos = np.searchsorted(self.keyframes, frame_index, side="right") - 1
+        return int(self.keyframes[max(pos, 0)])
+
+    # 與目標幀距離最近的關鍵幀（前後都算）
+    def nearest_keyframe(self, frame_index):
+        pos = np.searchsorted(self.keyframes, frame_index)
+        candidates = self.keyframes[max(pos - 1, 0):pos + 1]
+        return int(candidates[np.argmin(np.abs(candidates - frame_index))])
+
+    # 由時間（秒）找出對應的幀號
+    def frame_at_time(self, seconds):
+        pos = np.searchsorted(self.timestamps, seconds, side="right") - 1
+        return int(min(max(pos, 0), len(self.timestamps) - 1))
+
+    # 在 cv2.VideoCapture 上跳轉，回傳下一次 read() 會讀到的幀號
+    def seek(self, vid, frame_index, mode=SEEK_ACCURATE):
+        frame_index = int(min(max(frame_index, 0), max(len(self) - 1, 0)))
+        if mode == SEEK_KEYFRAME:
+            target = self.nearest_keyframe(frame_index)
+            vid.set(cv2.CAP_PROP_POS_FRAMES, target)
+            return target
+        keyframe = self.keyframe_before(frame_index)
+        vid.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+        # 從關鍵幀往後只 grab 不 retrieve，省掉色彩轉換
+        for position in range(keyframe, frame_index):
+            if not vid.grab():
+                return position
+        return frame_index
+
+    def save(self, path, video_path):
+        stat = os.stat(video_path)
+        # np.savez 會自動補上 .npz 副檔名，先寫到暫存檔再改名，避免其他程式讀到寫到一半的檔案
+        tmp_path = path[:-len(".npz")] + ".tmp.npz"
+        np.savez(tmp_path, version=INDEX_VERSION, size=stat.st_size, mtime=stat.st_mtime,
+                 keyframes=self.keyframes, timestamps=self.timestamps)
+        os.replace(tmp_path, path)
+
+    # 讀取索引檔；影片被修改過（大小或修改時間不同）或版本不符時回傳 None
+    @classmethod
+    def load(cls, path, video_path):
+        try:
+            with np.load(path) as data:
+                stat = os.stat(video_path)
+                if int(data["version"]) != INDEX_VERSION or int(data["size"]) != stat.st_size \
+                        or float(data["mtime"]) != stat.st_mtime:
+                    return None
+                return cls(data["keyframes"], data["timestamps"])
+        except (OSError, KeyError, ValueError):
+            return None
+
+    # 掃描影片的封包（不解碼）建立索引；依序嘗試 PyAV、ffprobe，都沒有時回傳 None
+    @classmethod
+    def build(cls, video_path):
+        for scan in (_scan_with_pyav, _scan_with_ffprobe):
+            try:
+                result = scan(video_path)
+            except (OSError, ValueError, subprocess.SubprocessError):
+                result = None
+            if result is not None:
+                pts, key_flags = result
+                return cls.from_packets(pts, key_flags)
+        return None
+
+    # 封包是依解碼順序排列的，有 B 幀時要依照顯示時間排序才是真正的幀號
+    @classmethod
+    def from_packets(cls, pts, key_flags):
+        pts = np.asarray(pts, dtype=np.float64)
+        key_flags = np.asarray(key_flags, dtype=bool)
+        if len(pts) == 0:
+            return None
+        order = np.argsort(pts, kind="stable")
+        timestamps = pts[order] - pts[order][0]
+        keyframes = np.flatnonzero(key_flags[order])
+        if len(keyframes) == 0 or keyframes[0] != 0:
+            keyframes = np.concatenate(([0], keyframes))
+        return cls(keyframes, timestamps)
+
+
+# 使用 PyAV 只讀取封包（demux），不做解碼
+def _scan_with_pyav(video_path):
+    try:
+        import av
+    except ImportError:
+        return None
+    pts, key_flags = [], []
+    with av.open(video_path) as container:
+        stream = container.streams.video[0]
+        time_base = float(stream.time_base)
+        for packet in container.demux(stream):
+            if packet.pts is None:
+                continue
+            pts.append(packet.pts * time_base)
+            key_flags.append(packet.is_keyframe)
+    return pts, key_flags
+
+
+# 沒有 PyAV 時改用 ffprobe 列出所有封包的時間與旗標
+def _scan_with_ffprobe(video_path):
+    ffprobe = shutil.which("ffprobe")
+    if ffprobe is None:
+        return None
+    output = subprocess.run(
+        [ffprobe, "-v", "error", "-select_streams", "v:0", "-show_entries", "packet=pts_time,flags",
+         "-of", "csv=p=0", video_path],
+        capture_output=True, text=True, check=True).stdout
+    pts, key_flags = [], []
+    for line in output.splitlines():
+        fields = line.strip().split(",")
+        if len(fields) < 2 or fields[0] in ("", "N/A"):
+            continue
+        pts.append(float(fields[0]))
+        key_flags.append("K" in fields[1])
+    return pts, key_flags
+
+
+# 讀取已存在的索引檔，沒有或已過期時重新建立並存檔
+def load_or_build(video_path):
+    path = sidecar_path(video_path)
+    index = SeekIndex.load(path, video_path)
+    if index is None:
+        index = SeekIndex.build(video_path)
+        if index is not None:
+            try:
+                index.save(path, video_path)
+            except OSError:
+                pass  # 影片所在的資料夾不能寫入時，只在記憶體中使用索引
+    return index
+
+
+# 在背景執行緒中建立索引，完成後呼叫 callback(index)；callback 在背景執行緒中被呼叫
+class SeekIndexBuilder(threading.Thread):
+    def __init__(self, video_path, callback=None):
+        super().__init__(daemon=True)
+        self.video_path = video_path
+        self.callback = callback
+        self.index = None
+
+    def run(self):
+        self.index = load_or_build(self.video_path)
+        if self.callback:
+            self.callback(self.index)
@@ -0,0 +1,83 @@
+# thumbnail_strip.py
+# 在背景每隔 N 幀解碼一張低解析度縮圖，全部存放在一個連續的 NumPy 陣列中
+# 拖動進度條時直接顯示最接近的縮圖，不需要跳轉和解碼原始解析度的影像
+import threading
+
+import cv2
+import numpy as np
+
+from decoder import open_capture
+
+
+class ThumbnailStrip(threading.Thread):
+    def __init__(self, video_source, step=None, height=90, max_thumbnails=600, seek_index=None, backend=None):
+        super().__init__(daemon=True)
+        self.video_source = video_source
+        self.seek_index = seek_index  # 有關鍵幀索引時只解碼關鍵幀，長 GOP 的影片會快很多
+        self.backend = backend  # 解碼器後端，與播放器使用相同的設定
+        vid = open_capture(video_source, backend)
+        total_frames = int(vid.get(cv2.CAP_PROP_FRAME_COUNT))
+        frame_width = int(vid.get(cv2.CAP_PROP_FRAME_WIDTH)) or 16
+        frame_height = int(vid.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 9
+        vid.release()
+        # 沒有指定間隔時，依影片長度決定，讓縮圖數量不超過 max_thumbnails
+        self.step = step or max(1, -(-total_frames // max_thumbnails))
+        self.count = max(1, -(-total_frames // self.step))
+        self.size = (max(1, round(frame_width * height / frame_height)), height)  # (寬, 高)
+        self.frames = np.zeros((self.count, height, self.size[0], 3), dtype=np.uint8)
+        self.ready = 0  # 已經解碼完成的縮圖數量（縮圖依序產生）
+        self._stopped = False
+
+    # 取得最接近 frame_index（之前）的縮圖，還沒解碼到的位置回傳 None
+    def thumbnail(self, frame_index):
+        slot = min(max(int(frame_index) // self.step, 0), self.count - 1)
+        if slot >= self.ready:
+            return None
+        return self.frames[slot]
+
+    def stop(self):
+        self._stopped = True
+
+    def run(self):
+        vid = open_capture(self.video_source, self.backend)
+        try:
+            if self.seek_index is not None:
+                self._decode_keyframes(vid)
+            else:
+                self._decode_sequential(vid)
+        finally:
+            vid.release()
+
+    # 依序讀取整部影片，只有取樣的幀才做 retrieve 和縮小
+    def _decode_sequential(self, vid):
+        position = 0
+        while self.ready < self.count and not self._stopped:
+            if not vid.grab():
+                break
+            if position % self.step == 0:
+                ret, frame = vid.retrieve()
+                if not ret:
+                    break
+                self._store(frame)
+            position += 1
+
+    # 每個取樣點使用它之前的關鍵幀，同一個關鍵幀只解碼一次
+    def _decode_keyframes(self, vid):
+        last_keyframe = None
+        while self.ready < self.count and not self._stopped:
+            keyframe = self.seek_index.keyframe_before(self.ready * self.step)
+            if keyframe == last_keyframe:
+                self.frames[self.ready] = self.frames[self.ready - 1]
+                self.ready += 1
+                continue
+            vid.set(cv2.CAP_PROP_POS_FRAMES, keyframe)
+            ret, frame = vid.read()
+            if not ret:
+                break
+            self._store(frame)
+            last_keyframe = keyframe
+
+    def _store(self, frame):
+        # 直接縮小寫入陣列中對應的位置，不另外配置記憶體
+        cv2.resize(frame, self.size, dst=self.frames[self.ready], interpolation=cv2.INTER_AREA)
+        self.ready += 1
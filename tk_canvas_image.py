@@ -0,0 +1,47 @@
+# tk_canvas_image.py
+# Tkinter 畫布上持續使用的影像物件：每個畫布只建立一個 image item，之後只更新內容
+# 大小不變時沿用同一個 PhotoImage（paste 覆蓋），色彩轉換寫入預先配置好的緩衝區，
+# 長時間播放時畫布上的物件不會越積越多，記憶體使用量與每幀的處理時間都保持穩定
+import tkinter as tk
+
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+
+class CanvasImage:
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.item = None  # 畫布上的 image item id
+        self.photo = None  # 目前使用的 PhotoImage，必須保留參考，否則會被回收而不顯示
+        self._rgba = None  # BGR -> RGBA 轉換用的緩衝區
+        self._image = None  # 直接對應到 _rgba 記憶體的 PIL 影像（不複製）
+
+    # 在 (x, y) 顯示一張 BGR 影像（左上角對齊）
+    def show(self, frame, x=0, y=0):
+        height, width = frame.shape[:2]
+        if self._rgba is None or self._rgba.shape[:2] != (height, width):
+            # 大小改變時才重新配置緩衝區與 PhotoImage
+            self._rgba = np.empty((height, width, 4), dtype=np.uint8)
+            self._image = Image.frombuffer("RGBA", (width, height), self._rgba, "raw", "RGBA", 0, 1)
+            self.photo = None
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGBA, dst=self._rgba)
+        if self.photo is None:
+            self.photo = ImageTk.PhotoImage(image=self._image)
+            if self.item is None:
+                self.item = self.canvas.create_image(x, y, image=self.photo, anchor=tk.NW)
+                self.canvas.tag_lower(self.item)  # 保持在圈選框等其他物件的下方
+            else:
+                self.canvas.itemconfig(self.item, image=self.photo)
+        else:
+            self.photo.paste(self._image)
+        self.canvas.coords(self.item, x, y)
+
+    # 移除畫布上的影像（例如 reset 時）
+    def clear(self):
+        if self.item is not None:
+            self.canvas.delete(self.item)
+        self.item = None
+        self.photo = None
+        self._rgba = None
+        self._image = None
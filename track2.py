@@ -4,7 +4,7 @@ import numpy as np
 import tkinter as tk
 from tkinterdnd2 import DND_FILES, TkinterDnD
 from tkinter import filedialog
-from PIL import Image, ImageTk
+from tk_canvas_image import CanvasImage
 from datetime import timedelta
 
 # 創建VideoPlayer類別
@@ -67,6 +67,9 @@ class VideoPlayer:
         # 創建畫布到 "Zoom View" 視窗
         self.zoom_canvas = tk.Canvas(self.zoom_window, width=640, height=480)
         self.zoom_canvas.pack(expand=True, fill=tk.BOTH)
+        # 每個畫布只建立一個影像物件，之後每一幀只更新內容
+        self.canvas_image = CanvasImage(self.canvas)
+        self.zoom_canvas_image = CanvasImage(self.zoom_canvas)
         self.zoom_window.withdraw()
 
         # 綁定鼠標事件
@@ -171,10 +174,8 @@ class VideoPlayer:
                         # 將影像放入空白畫布
                         zoom_canvas_frame[y_offset:y_offset+new_zoomed_height, x_offset:x_offset+new_zoomed_width] = zoomed_frame
                         
-                        # 轉換為RGB格式以顯示
-                        zoom_canvas_frame = cv2.cvtColor(zoom_canvas_frame, cv2.COLOR_BGR2RGB)
-                        self.zoom_photo = ImageTk.PhotoImage(image=Image.fromarray(zoom_canvas_frame))
-                        self.zoom_canvas.create_image(0, 0, image=self.zoom_photo, anchor=tk.NW)
+                        # 更新放大畫布上的影像（色彩轉換在 CanvasImage 中完成）
+                        self.zoom_canvas_image.show(zoom_canvas_frame)
 
 
                 # 獲取畫布的寬度和高度
@@ -191,9 +192,7 @@ class VideoPlayer:
                 x_offset = (canvas_width - new_width) // 2
                 y_offset = (canvas_height - new_height) // 2
 
-                resized_frame = cv2.cvtColor(resized_frame, cv2.COLOR_BGR2RGB)
-                self.photo = ImageTk.PhotoImage(image=Image.fromarray(resized_frame))
-                self.canvas.create_image(x_offset, y_offset, image=self.photo, anchor=tk.NW)
+                self.canvas_image.show(resized_frame, x_offset, y_offset)
 
                 self.current_frame = int(self.vid.get(cv2.CAP_PROP_POS_FRAMES))
                 progress_value = (self.current_frame / self.total_frames) * 100
@@ -233,6 +232,8 @@ class VideoPlayer:
         # 停止播放影片並釋放資源
         if self.vid:
             self.vid.release()
+        self.canvas_image.clear()
+        self.zoom_canvas_image.clear()
         self.canvas.delete("all")  # 清空畫布上的所有圖像
         self.zoom_canvas.delete("all")  # 清空放大視窗畫布上的所有圖像
         # 重置進度條和時間標籤
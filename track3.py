@@ -1,11 +1,21 @@
 # 調整放大比例 輸入自動調整為720p
 import cv2
-import numpy as np
 import tkinter as tk
 from tkinterdnd2 import DND_FILES, TkinterDnD
 from tkinter import filedialog
-from PIL import Image, ImageTk
+from tk_canvas_image import CanvasImage
+from letterbox import Letterbox
+from zoom_renderer import ZoomRenderer
+from tracker_registry import available_trackers, create_tracker, DEFAULT_TRACKER, TRACKING_RESOLUTIONS, RESOLUTION_FULL
+from loss_recovery import RecoveringTracker
+from detector import Detector
+from detection_cache import video_fingerprint
+from track_store import MODE_REPLACE, TrackStore, TrackStoreWriter, track_path
 from datetime import timedelta
+from decoder import open_capture, fit_size
+from seek_index import SeekIndexBuilder
+from thumbnail_strip import ThumbnailStrip
+from presentation_clock import PresentationClock
 
 # 創建VideoPlayer類別
 class VideoPlayer:
@@ -53,11 +63,27 @@ class VideoPlayer:
         self.clear_button = tk.Button(self.control_frame, text="Clear", command=self.clear_trace)
         self.clear_button.pack(side=tk.LEFT)
 
+        # 解碼器後端（auto 依副檔名決定），每個檔案載入時套用
+        self.decoder_var = tk.StringVar(value="auto")
+        self.decoder_menu = tk.OptionMenu(self.control_frame, self.decoder_var, "auto", "opencv", "pyav", "ffmpeg")
+        self.decoder_menu.pack(side=tk.LEFT)
+
+        # 追蹤演算法，每次圈選 ROI 後按下 Play 時套用
+        self.tracker_var = tk.StringVar(value=DEFAULT_TRACKER)
+        self.tracker_menu = tk.OptionMenu(self.control_frame, self.tracker_var, *available_trackers())
+        self.tracker_menu.pack(side=tk.LEFT)
+
+        # 追蹤解析度：追蹤器在縮小的幀上執行，追蹤框換算回原始座標
+        self.resolution_var = tk.StringVar(value=RESOLUTION_FULL)
+        self.resolution_menu = tk.OptionMenu(self.control_frame, self.resolution_var, *TRACKING_RESOLUTIONS)
+        self.resolution_menu.pack(side=tk.LEFT)
+
         # 進度條
         self.progress = tk.Scale(self.control_frame, from_=0, to=100, orient=tk.HORIZONTAL, length=400, showvalue=0)
         self.progress.pack(side=tk.BOTTOM, fill=tk.X)
         #self.progress.bind("<Motion>", self.on_progress_move)
         self.progress.bind("<B1-Motion>", self.on_progress_move)
+        self.progress.bind("<ButtonRelease-1>", self.on_progress_release)
 
         # 顯示時間的標籤
         self.time_label = tk.Label(self.window, text="00:00 / 00:00")
@@ -70,6 +96,15 @@ class VideoPlayer:
         # 創建畫布到 "Zoom View" 視窗
         self.zoom_canvas = tk.Canvas(self.zoom_window, width=640, height=480)
         self.zoom_canvas.pack(expand=True, fill=tk.BOTH)
+        # 每個畫布只建立一個影像物件，之後每一幀只更新內容
+        self.canvas_image = CanvasImage(self.canvas)
+        self.zoom_canvas_image = CanvasImage(self.zoom_canvas)
+        # 兩個畫布的縮放比例、偏移量與緩衝區，只在畫布大小改變（<Configure>）時重新計算
+        self.letterbox = Letterbox()
+        self.zoom_size = (640, 480)  # 放大畫布的大小 (寬, 高)
+        self.zoom_renderer = ZoomRenderer(background=255)  # 追蹤框的範圍一次完成裁切與縮放（白色補邊）
+        self.canvas.bind("<Configure>", lambda event: self.letterbox.set_view_size(event.width, event.height))
+        self.zoom_canvas.bind("<Configure>", self.on_zoom_configure)
         self.zoom_window.withdraw()
 
         # 綁定鼠標事件
@@ -77,15 +112,25 @@ class VideoPlayer:
         self.canvas.bind("<B1-Motion>", self.on_mouse_drag)
         self.canvas.bind("<ButtonRelease-1>", self.on_mouse_release)
 
-        self.vid = None  # cv2.VideoCapture對象
+        self.vid = None  # cv2.VideoCapture對象（或 decoder.py 中相容的解碼器物件）
         self.video_source = None  # 影片資料路徑
+        self.decoder_backend = None  # 這個檔案使用的解碼器後端，None 表示依副檔名自動選擇
+        self.decode_at_display_size = True  # 沒有追蹤時讓解碼器直接輸出畫布大小的幀
+        self.frame_size = (0, 0)  # 影片的原始大小 (寬, 高)
         self.current_frame = 0
         self.total_frames = 0
         self.fps = 0
         self.delay = 0
+        self.clock = None  # 播放時鐘，依照每一幀的時間決定下一次 update 的時間與是否丟幀
         self.total_duration = timedelta(0)
         self.tracker = None
+        self.detector = None  # 追丟後找回目標用的偵測器，第一次開始追蹤時載入；False 表示無法使用
+        self.video_hash = None  # 影片內容的雜湊，用來確認 .tracks 檔是這部影片的
+        self.track_store = None  # 之前追蹤的結果（.tracks 檔），沒有追蹤時畫在畫面上
+        self.track_writer = None  # 追蹤時把每一幀的結果寫入 .tracks 檔
         self.roi = None
+        self.seek_index = None  # 關鍵幀與時間戳索引，載入影片後在背景建立
+        self.thumbnails = None  # 拖動進度條時顯示的縮圖條，索引建立完成後在背景解碼
 
         self.window.mainloop()  # 啟動 Tkinter 的主循環，讓窗口保持顯示並等待事件觸發
             
@@ -113,94 +158,86 @@ class VideoPlayer:
     def load_video(self, video_source):
         if self.vid:
             self.vid.release()
+        self.stop_thumbnails()
         self.video_source = video_source
-        self.vid = cv2.VideoCapture(self.video_source) 
+        self.video_hash = video_fingerprint(video_source)
+        self.decoder_backend = None if self.decoder_var.get() == "auto" else self.decoder_var.get()
+        self.vid = open_capture(self.video_source, self.decoder_backend)
+        # 在背景建立（或從影片旁的 .seekidx.npz 讀取）關鍵幀索引
+        self.seek_index = None
+        SeekIndexBuilder(video_source, lambda index, path=video_source: self.on_seek_index_ready(path, index)).start()
         self.current_frame = 0
         self.total_frames = int(self.vid.get(cv2.CAP_PROP_FRAME_COUNT))
         self.fps = self.vid.get(cv2.CAP_PROP_FPS)
-        self.delay = int(500 / self.fps)   # self.delay = int(1000 / self.fps)
+        self.frame_size = (int(self.vid.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.vid.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self.delay = int(1000 / self.fps)  # 讀不到幀（影片結尾）時隔多久再檢查一次
+        self.clock = PresentationClock(self.fps)
         #print(self.fps)
         #print(self.delay)
         self.total_duration = timedelta(seconds=int(self.total_frames / self.fps))
-        self.tracker = None
+        self.stop_tracker()
         self.roi = None
         self.drop_frame.pack_forget()
         self.canvas.pack(expand=True, fill=tk.BOTH)
         self.update()
-    '''
-        # 調整影片解析度到720p
-    def resize_frame_to_720p(self, frame):
-        # 目標解析度 720p (1280x720)
-        target_width = 1280
-        target_height = 720
-        return cv2.resize(frame, (target_width, target_height), interpolation=cv2.INTER_LINEAR)
-    '''
+    # 索引建立完成（在背景執行緒中被呼叫），只做屬性設定；若這段期間已經換了影片就忽略
+    def on_seek_index_ready(self, path, index):
+        if path == self.video_source:
+            self.seek_index = index
+            # 有索引時縮圖只需要解碼關鍵幀
+            self.thumbnails = ThumbnailStrip(path, seek_index=index, backend=self.decoder_backend)
+            self.thumbnails.start()
+
+    def stop_thumbnails(self):
+        if self.thumbnails:
+            self.thumbnails.stop()
+            self.thumbnails = None
+
+    # 跳轉到 self.current_frame；有索引時從前一個關鍵幀往後解碼，比 OpenCV 自己往回搜尋快
+    def seek_to_current_frame(self):
+        if self.seek_index:
+            self.current_frame = self.seek_index.seek(self.vid, self.current_frame)
+        else:
+            self.vid.set(cv2.CAP_PROP_POS_FRAMES, self.current_frame)
 
     
     # 對影片的每一幀做處理，物件追蹤，放大後畫面處理，影片適應視窗大小
     def update(self):
         if self.vid and self.vid.isOpened():
+            self.update_decode_size()
+            # 已經落後超過一幀時用 grab() 跳過（不做色彩轉換、追蹤與顯示），讓播放速度跟上影片
+            while self.clock.running and self.clock.should_drop(self.current_frame / self.fps) and self.vid.grab():
+                self.clock.frame_dropped()
+                self.current_frame += 1
+            frame_index = self.current_frame
+            pts = self.current_frame / self.fps  # 這一幀的顯示時間（秒）
             ret, frame = self.vid.read()
             if ret:
-                # 將每一幀調整為720p
-                #frame = self.resize_frame_to_720p(frame)
+                self.clock.frame_presented(pts)
                 if self.tracker and self.tracking:
                     success, bbox = self.tracker.update(frame)
+                    if self.track_writer:
+                        self.track_writer.append(frame_index, [(0, success, bbox)], {0: self.tracker})
                     if success:
                         # 繪製追蹤框
                         p1 = (int(bbox[0]), int(bbox[1]))
                         p2 = (int(bbox[0] + bbox[2]), int(bbox[1] + bbox[3]))
                         # cv2.rectangle 在圖像上繪製矩形框
                         cv2.rectangle(frame, p1, p2, (255, 0, 0), 2, 1)
-                        # 顯示放大畫面
-                        zoomed_frame = frame[p1[1]:p2[1], p1[0]:p2[0]]
-                        
-                        # 計算放大畫布的大小
-                        zoom_canvas_width = self.zoom_canvas.winfo_width()
-                        zoom_canvas_height = self.zoom_canvas.winfo_height()
-
-                        # 計算影像的大小，以保持等比例
-                        zoomed_height, zoomed_width = zoomed_frame.shape[:2]
-                        zoom_scale = min(zoom_canvas_width / zoomed_width, zoom_canvas_height / zoomed_height)
-                        new_zoomed_width = int(zoomed_width * zoom_scale)
-                        new_zoomed_height = int(zoomed_height * zoom_scale)
-
-                        # 調整影像大小
-                        zoomed_frame = cv2.resize(zoomed_frame, (new_zoomed_width, new_zoomed_height), interpolation=cv2.INTER_LINEAR)
-
-                        # 創建空白畫布以適應放大影像
-                        zoom_canvas_frame = 255 * np.ones(shape=[zoom_canvas_height, zoom_canvas_width, 3], dtype=np.uint8)
-                        
-                        # 計算顯示影像的起始點
-                        x_offset = (zoom_canvas_width - new_zoomed_width) // 2
-                        y_offset = (zoom_canvas_height - new_zoomed_height) // 2
-                        
-                        # 將影像放入空白畫布
-                        zoom_canvas_frame[y_offset:y_offset+new_zoomed_height, x_offset:x_offset+new_zoomed_width] = zoomed_frame
-                        
-                        # 轉換為RGB格式以顯示
-                        zoom_canvas_frame = cv2.cvtColor(zoom_canvas_frame, cv2.COLOR_BGR2RGB)
-                        self.zoom_photo = ImageTk.PhotoImage(image=Image.fromarray(zoom_canvas_frame))
-                        self.zoom_canvas.create_image(0, 0, image=self.zoom_photo, anchor=tk.NW)
-
-
-                # 獲取畫布的寬度和高度
-                canvas_width = self.canvas.winfo_width()
-                canvas_height = self.canvas.winfo_height()
-                frame_height, frame_width = frame.shape[:2]
-                scale = min(canvas_width / frame_width, canvas_height / frame_height)
-
-                # 調整影像的大小
-                new_width = int(frame_width * scale)
-                new_height = int(frame_height * scale)
-                resized_frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
-
-                x_offset = (canvas_width - new_width) // 2
-                y_offset = (canvas_height - new_height) // 2
-
-                resized_frame = cv2.cvtColor(resized_frame, cv2.COLOR_BGR2RGB)
-                self.photo = ImageTk.PhotoImage(image=Image.fromarray(resized_frame))
-                self.canvas.create_image(x_offset, y_offset, image=self.photo, anchor=tk.NW)
+                    # 顯示放大畫面：卡爾曼濾波平滑過的框的範圍等比例放大後置中放進放大畫布，直接寫入重複使用的緩衝區
+                    # 追丟時平滑過的框為預測的位置，放大畫面沿著預測的方向繼續移動
+                    zoom_bbox = self.tracker.smoothed_bbox or (bbox if success else None)
+                    if zoom_bbox is not None:
+                        zoom_canvas_frame = self.zoom_renderer.render(frame, zoom_bbox, self.zoom_size)
+                        # 更新放大畫布上的影像（色彩轉換在 CanvasImage 中完成）
+                        self.zoom_canvas_image.show(zoom_canvas_frame)
+                elif self.track_store:
+                    # 沒有追蹤時畫出 .tracks 檔中之前追蹤的結果
+                    self.draw_stored_boxes(frame, frame_index)
+
+                # 調整影像的大小；解碼器已經輸出畫布大小時不需要再縮放
+                resized_frame = self.letterbox.resize(frame)
+                self.canvas_image.show(resized_frame, self.letterbox.x_offset, self.letterbox.y_offset)
 
                 self.current_frame = int(self.vid.get(cv2.CAP_PROP_POS_FRAMES))
                 progress_value = (self.current_frame / self.total_frames) * 100
@@ -209,20 +246,79 @@ class VideoPlayer:
                 time_str = f"{str(current_time)[:7]} / {str(self.total_duration)[:7]}"
                 self.time_label.config(text=time_str)
 
-            # after 方法是 Tkinter 窗口對象的一部分，用於安排定時任務， 將 self.update 方法安排為在 self.delay 毫秒後被調用
-            self.window.after(self.delay, self.update)
+                # 依照下一幀的顯示時間扣掉這一幀已經花掉的處理時間，決定多久之後再呼叫 update
+                delay = max(1, int(self.clock.delay(self.current_frame / self.fps) * 1000))
+            else:
+                delay = self.delay
+
+            # after 方法是 Tkinter 窗口對象的一部分，用於安排定時任務， 將 self.update 方法安排為在 delay 毫秒後被調用
+            self.window.after(delay, self.update)
     
+    # 丟掉目前的追蹤器，並印出它每一幀的平均時間；追蹤的結果已經寫入 .tracks 檔，重新讀取後之後播放、拖動時還看得到
+    def stop_tracker(self):
+        if self.tracker and self.tracker.frames:
+            print(f"Tracker: {self.tracker.stats()}")
+        self.tracker = None
+        if self.track_writer:
+            self.track_store = None  # 關閉時會改寫檔案（刪掉這次重新追蹤的範圍內的舊紀錄），先放掉 memmap
+            self.track_writer.close()
+            print(f"Track store: {self.track_writer.rows} records written to {self.track_writer.path}")
+            self.track_writer = None
+        self.track_store = TrackStore.load(track_path(self.video_source), self.video_hash) if self.video_source else None
+
+    # 在幀上畫出 .tracks 檔中這一幀的追蹤框；幀可能是以畫布大小解碼的（或是縮圖），依寬度的比例換算
+    def draw_stored_boxes(self, frame, frame_index):
+        scale = frame.shape[1] / self.frame_size[0]
+        for _, (x, y, w, h) in self.track_store.boxes_at(frame_index):
+            cv2.rectangle(frame, (int(x * scale), int(y * scale)), (int((x + w) * scale), int((y + h) * scale)),
+                          (0, 255, 255), 2, 1)
+
+    # 載入追丟後找回目標用的偵測器（只嘗試一次）；沒有權重檔或 OpenCV 不支援時只用樣板比對
+    def load_detector(self):
+        if self.detector is None:
+            try:
+                self.detector = Detector()
+            except (OSError, RuntimeError, cv2.error) as e:
+                print(f"Detector unavailable ({e}), recovering lost targets by template matching only")
+                self.detector = False
+        return self.detector or None
+
+    # 放大畫布大小改變時記下新的大小，下一幀直接縮放成這個大小
+    def on_zoom_configure(self, event):
+        self.zoom_size = (event.width, event.height)
+
+    # 沒有追蹤時讓解碼器直接輸出畫布大小的幀，省掉原始解析度的色彩轉換和縮放；視窗大小改變時也會跟著調整
+    # 追蹤時追蹤器和放大畫面需要原始解析度
+    def update_decode_size(self):
+        size = None
+        if self.decode_at_display_size and not (self.tracker and self.tracking):
+            size = fit_size(self.frame_size, self.letterbox.view_size)
+        if size != self.vid.output_size:
+            self.vid.set_output_size(size)
+
     # 開始播放視頻並啟動物體追蹤
     def play_video(self):
         if self.vid and not self.vid.isOpened():
-            self.vid = cv2.VideoCapture(self.video_source)
-            self.vid.set(cv2.CAP_PROP_POS_FRAMES, self.current_frame)
+            self.vid = open_capture(self.video_source, self.decoder_backend)
+            self.seek_to_current_frame()
         if self.roi and self.roi[2] and self.roi[3]:
-            #self.tracker = cv2.TrackerKCF_create()  # 替換為 KCF 追蹤器
-            self.tracker = cv2.TrackerCSRT_create()
+            # 依照選擇的演算法建立追蹤器（CSRT 最準但最慢，KCF / MOSSE 快很多）
+            self.stop_tracker()
+            self.tracker = create_tracker(self.tracker_var.get(), self.resolution_var.get())
+            # 追丟時在最後的位置周圍以樣板比對、偵測器找回目標，並重新初始化追蹤器
+            self.tracker = RecoveringTracker(self.tracker, self.load_detector(), budget=1.0 / self.fps)
+            # 追蹤器需要原始解析度的幀
+            self.update_decode_size()
             ret, frame = self.vid.read()
             if ret:
                 self.tracker.init(frame, self.roi)
+                # 追蹤的結果附加到影片旁邊的 .tracks 檔，停止時取代之前同一段的結果（開啟寫入前先放掉 memmap）
+                self.track_store = None
+                try:
+                    self.track_writer = TrackStoreWriter(track_path(self.video_source), self.video_hash, mode=MODE_REPLACE)
+                    self.track_writer.append(self.current_frame, [(0, True, self.roi)])
+                except OSError as e:
+                    print(f"Track store unavailable ({e})")
                 self.zoom_window.deiconify()
         #self.tracking = True
         self.update()  # 調用 update 方法，開始進行定時更新。update 方法會定期刷新視頻畫面，並在必要時進行追蹤處理
@@ -231,6 +327,9 @@ class VideoPlayer:
     def pause_video(self):
         if self.vid:
             self.vid.release()
+        if self.clock:
+            # 停止播放時鐘，繼續播放時以第一個顯示的幀重新計時
+            self.clock.stop()
         self.tracking = False
         self.start_x = None
         self.start_y = None
@@ -240,6 +339,14 @@ class VideoPlayer:
         # 停止播放影片並釋放資源
         if self.vid:
             self.vid.release()
+        self.stop_thumbnails()
+        self.canvas_image.clear()
+        self.zoom_canvas_image.clear()
+        if self.clock and self.clock.presented:
+            print(f"Playback: {self.clock.stats()}")
+        if self.zoom_renderer.frames:
+            print(f"Zoom: {self.zoom_renderer.stats()}")
+        self.clock = None
         self.canvas.delete("all")  # 清空畫布上的所有圖像
         self.zoom_canvas.delete("all")  # 清空放大視窗畫布上的所有圖像
         # 重置進度條和時間標籤
@@ -253,36 +360,62 @@ class VideoPlayer:
         # 重置變量
         self.vid = None
         self.video_source = None
+        self.video_hash = None
         self.current_frame = 0
         self.total_frames = 0
         self.fps = 0
         self.delay = 0
         self.total_duration = timedelta(0)
-        self.tracker = None
+        self.stop_tracker()
         self.roi = None
+        self.seek_index = None
         self.tracking = False
 
     def clear_trace(self):
         # 隱藏放大視窗
         self.zoom_window.withdraw()
-        self.tracker = None
+        self.stop_tracker()
         self.roi = None
         self.tracking = False
         self.start_x = None
         self.start_y = None
         self.rect_id = None
         if self.vid and not self.vid.isOpened():
-            self.vid = cv2.VideoCapture(self.video_source)
-            self.vid.set(cv2.CAP_PROP_POS_FRAMES, self.current_frame)
+            self.vid = open_capture(self.video_source, self.decoder_backend)
+            self.seek_to_current_frame()
             self.update()
             self.pause_video()
 
     def on_progress_move(self, event):
         #if self.vid and not self.tracking:  # 確保只有在非追蹤狀態下進行幀的更新:
-        self.vid.release()
+        # 釋放影片來停止播放；關閉後的 capture 不能跳轉（PyAV / ffmpeg 後端），跳轉留到放開進度條重新開啟時再做
+        if self.vid:
+            self.vid.release()
         progress_value = self.progress.get()
         self.current_frame = int((progress_value / 100) * self.total_frames)
-        self.vid.set(cv2.CAP_PROP_POS_FRAMES, self.current_frame)
+        if self.clock:
+            self.clock.stop()
+        # 拖動期間只顯示縮圖，不做跳轉和解碼
+        thumbnail = self.thumbnails.thumbnail(self.current_frame) if self.thumbnails else None
+        if thumbnail is not None:
+            self.show_thumbnail(thumbnail)
+
+    # 放開進度條時才真正解碼使用者選擇的幀並顯示出來
+    def on_progress_release(self, event):
+        if self.vid and not self.vid.isOpened():
+            self.vid = open_capture(self.video_source, self.decoder_backend)
+            self.seek_to_current_frame()
+            self.update()
+            self.pause_video()
+
+    # 把縮圖放大到畫布大小顯示
+    def show_thumbnail(self, thumbnail):
+        resized_thumbnail = self.letterbox.resize(thumbnail)
+        if self.track_store:
+            if resized_thumbnail is thumbnail:
+                resized_thumbnail = thumbnail.copy()  # 縮圖是縮圖條中共用的，不能直接畫在上面
+            self.draw_stored_boxes(resized_thumbnail, self.current_frame)
+        self.canvas_image.show(resized_thumbnail, self.letterbox.x_offset, self.letterbox.y_offset)
 
     def on_mouse_click(self, event):
         if not self.tracking:
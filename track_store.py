@@ -0,0 +1,188 @@
+# track_store.py
+# 追蹤結果的二進位檔：每一幀每個目標一筆固定大小的紀錄（幀號、目標編號、追蹤框、信心度、旗標），存成影片旁邊的 .tracks 檔
+# 檔案為 64 位元組的檔頭加上 TRACK_DTYPE 結構陣列的原始資料，讀取時以 np.memmap 直接對應到檔案，
+# 追蹤時一批一批附加到檔尾（中途結束也只會少掉最後一批），播放器拖動進度條時直接從檔案取出追蹤框，不需要重新追蹤
+import os
+import struct
+import threading
+
+import numpy as np
+
+from detection_cache import video_fingerprint
+
+STORE_MAGIC = b"TRKSTORE"
+STORE_VERSION = 1
+HEADER_SIZE = 64
+HEADER_FORMAT = "<8sII40s"  # 識別字、版本、每筆紀錄的大小、影片內容的雜湊（sha1 的十六進位字串）
+
+FLAG_LOST = 1  # 追蹤器追丟，追蹤框為最後回傳的值，不畫出來
+FLAG_RECOVERED = 2  # 追丟後由 loss_recovery 找回
+
+# TrackStoreWriter 如何處理檔案中之前的紀錄
+MODE_APPEND = "append"  # 全部保留
+MODE_REPLACE = "replace"  # 關閉時刪掉與這次追蹤的幀範圍重疊的舊紀錄（重新追蹤同一段時不會畫出兩次）
+MODE_TRUNCATE = "truncate"  # 全部刪掉，重新寫檔
+
+TRACK_DTYPE = np.dtype([("frame", "<i4"), ("track_id", "<i4"), ("x", "<f4"), ("y", "<f4"), ("w", "<f4"), ("h", "<f4"),
+                        ("confidence", "<f4"), ("flags", "u1")])
+
+
+# 把一幀的追蹤結果 [(目標編號, 是否成功, bbox), ...] 轉成 TRACK_DTYPE 的紀錄（tuple）
+# targets 為目標編號 -> 追蹤器，用來取得是否剛找回目標（loss_recovery.RecoveringTracker.just_recovered）
+def track_records(frame_index, results, targets=None, id_offset=0):
+    records = []
+    for target_id, success, bbox in results:
+        flags = 0 if success else FLAG_LOST
+        if targets is not None and getattr(targets.get(target_id), "just_recovered", False):
+            flags |= FLAG_RECOVERED
+        records.append((frame_index, target_id + id_offset, *bbox, 1.0 if success else 0.0, flags))
+    return records
+
+
+# 例如 video.mp4 -> video.mp4.tracks
+def track_path(video_path):
+    return video_path + ".tracks"
+
+
+def _read_header(f):
+    data = f.read(HEADER_SIZE)
+    if len(data) < HEADER_SIZE:
+        return None
+    magic, version, itemsize, fingerprint = struct.unpack_from(HEADER_FORMAT, data)
+    if magic != STORE_MAGIC or version != STORE_VERSION or itemsize != TRACK_DTYPE.itemsize:
+        return None
+    return fingerprint.decode("ascii")
+
+
+class TrackStore:
+    def __init__(self, records):
+        self.records = records  # TRACK_DTYPE 的結構陣列（通常是 np.memmap）
+        # 依幀號排序的索引（不同次追蹤的紀錄可能不是依幀號排列的）
+        self._order = np.argsort(records["frame"], kind="stable")
+        self._frames = np.asarray(records["frame"])[self._order]
+
+    def __len__(self):
+        return len(self.records)
+
+    # 某一幀的所有紀錄
+    def records_at(self, frame_index):
+        start, stop = np.searchsorted(self._frames, [frame_index, frame_index + 1])
+        return self.records[self._order[start:stop]]
+
+    # 某一幀追蹤成功的 [(目標編號, (x, y, w, h)), ...]
+    def boxes_at(self, frame_index):
+        records = self.records_at(frame_index)
+        records = records[(records["flags"] & FLAG_LOST) == 0]
+        return [(int(r["track_id"]), (float(r["x"]), float(r["y"]), float(r["w"]), float(r["h"]))) for r in records]
+
+    # 讀取 .tracks 檔；不存在、格式不符或影片內容不同（fingerprint 不為 None 時檢查）時回傳 None
+    @classmethod
+    def load(cls, path, fingerprint=None):
+        try:
+            with open(path, "rb") as f:
+                stored = _read_header(f)
+            size = os.path.getsize(path)
+        except OSError:
+            return None
+        if stored is None or (fingerprint is not None and stored != fingerprint):
+            return None
+        count = (size - HEADER_SIZE) // TRACK_DTYPE.itemsize  # 寫到一半的最後一筆不算
+        if count == 0:
+            return cls(np.zeros(0, dtype=TRACK_DTYPE))
+        return cls(np.memmap(path, dtype=TRACK_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,)))
+
+
+# 追蹤時把結果附加到 .tracks 檔；同一部影片之前的紀錄依 mode（MODE_*）保留或刪掉，新的目標編號接在之前最大的編號之後
+# append 由追蹤執行緒呼叫，flush / close 可以在其他執行緒呼叫；MODE_REPLACE 關閉時會改寫檔案，讀取的一方要先放掉 memmap
+class TrackStoreWriter:
+    def __init__(self, path, fingerprint, flush_every=256, mode=MODE_APPEND):
+        self.path = path
+        self.flush_every = flush_every  # 累積幾筆紀錄寫入一次
+        self.mode = mode
+        self.rows = 0  # 已寫入的紀錄數
+        self.frame_range = None  # 這次寫入的紀錄的 (最小幀號, 最大幀號)
+        self._pending = []
+        self._lock = threading.Lock()
+        existing = TrackStore.load(path, fingerprint) if mode != MODE_TRUNCATE else None
+        if existing is None:
+            # 沒有檔案、其他影片 / 舊格式的檔案或是要重新寫檔：重新寫檔頭
+            with open(path, "wb") as f:
+                header = struct.pack(HEADER_FORMAT, STORE_MAGIC, STORE_VERSION, TRACK_DTYPE.itemsize,
+                                     fingerprint.encode("ascii"))
+                f.write(header.ljust(HEADER_SIZE, b"\0"))
+            self.id_offset = 0
+            self._existing = 0
+        else:
+            self.id_offset = int(existing.records["track_id"].max()) + 1 if len(existing) else 0
+            self._existing = len(existing)  # 之前的紀錄數
+            del existing
+            # 去掉寫到一半的最後一筆，之後的紀錄才會對齊
+            size = os.path.getsize(path)
+            valid = HEADER_SIZE + self._existing * TRACK_DTYPE.itemsize
+            if valid != size:
+                os.truncate(path, valid)
+        self._file = open(path, "ab")
+
+    # 加入一幀的追蹤結果（參數與 track_records 相同）
+    def append(self, frame_index, results, targets=None):
+        records = track_records(frame_index, results, targets, self.id_offset)
+        with self._lock:
+            self._pending += records
+            full = len(self._pending) >= self.flush_every
+        if full:
+            self.flush()
+
+    # 直接附加一個 TRACK_DTYPE 的結構陣列（例如 headless_track 的結果）
+    def extend(self, records):
+        self.flush()
+        records = np.array(records, dtype=TRACK_DTYPE)
+        records["track_id"] += self.id_offset
+        with self._lock:
+            self._write(records)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if pending:
+                self._write(np.array(pending, dtype=TRACK_DTYPE))
+
+    def _write(self, records):
+        if self._file.closed:
+            return  # 追蹤執行緒在關閉之後才送來的結果
+        self._file.write(records.tobytes())
+        self._file.flush()
+        self.rows += len(records)
+        if len(records):
+            first, last = int(records["frame"].min()), int(records["frame"].max())
+            if self.frame_range is not None:
+                first, last = min(first, self.frame_range[0]), max(last, self.frame_range[1])
+            self.frame_range = (first, last)
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.close()
+            if self.mode == MODE_REPLACE and self._existing and self.frame_range is not None:
+                self._drop_replaced()
+
+    # 刪掉之前的紀錄中幀號落在這次追蹤的範圍內的部分，其餘的舊紀錄與這次的紀錄依原本的順序寫回
+    def _drop_replaced(self):
+        records = np.fromfile(self.path, dtype=TRACK_DTYPE, offset=HEADER_SIZE)
+        old, new = records[:self._existing], records[self._existing:]
+        first, last = self.frame_range
+        keep = (old["frame"] < first) | (old["frame"] > last)
+        if keep.all():
+            return
+        with open(self.path, "r+b") as f:
+            f.seek(HEADER_SIZE)
+            f.write(old[keep].tobytes())
+            f.write(new.tobytes())
+            f.truncate()
+        self._existing = int(keep.sum())
+
+
+# 讀取影片旁邊的 .tracks 檔（影片內容不同時不使用）
+def load_for_video(video_path, fingerprint=None):
+    return TrackStore.load(track_path(video_path), fingerprint or video_fingerprint(video_path))
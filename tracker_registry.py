@@ -0,0 +1,193 @@
+# tracker_registry.py
+# 追蹤器後端登記表：CSRT、KCF、MOSSE、MIL，以及以 DNN 模型為基礎的 Nano、DaSiamRPN、ViT
+# 每個追蹤器都包裝成相同的介面（init / update，與 cv2.Tracker 相同），並記錄每一幀 update 花費的時間，
+# 播放器可以依每次圈選的 ROI 選擇追蹤演算法，在準確度與速度之間取捨
+import os
+import time
+
+import cv2
+import numpy as np
+
+TRACKER_CSRT = "csrt"
+TRACKER_KCF = "kcf"
+TRACKER_MOSSE = "mosse"
+TRACKER_MIL = "mil"
+TRACKER_NANO = "nano"
+TRACKER_DASIAMRPN = "dasiamrpn"
+TRACKER_VIT = "vit"
+
+# DNN 追蹤器的模型檔（OpenCV Zoo 提供的 ONNX 模型），放在 models 目錄
+MODEL_DIR = "models"
+NANO_BACKBONE = os.path.join(MODEL_DIR, "nanotrack_backbone_sim.onnx")
+NANO_NECKHEAD = os.path.join(MODEL_DIR, "nanotrack_head_sim.onnx")
+DASIAMRPN_MODEL = os.path.join(MODEL_DIR, "dasiamrpn_model.onnx")
+DASIAMRPN_KERNEL_CLS1 = os.path.join(MODEL_DIR, "dasiamrpn_kernel_cls1.onnx")
+DASIAMRPN_KERNEL_R1 = os.path.join(MODEL_DIR, "dasiamrpn_kernel_r1.onnx")
+VIT_MODEL = os.path.join(MODEL_DIR, "object_tracking_vittrack_2023sep.onnx")
+
+DEFAULT_TRACKER = TRACKER_CSRT
+
+# 追蹤解析度："full" 使用原始解析度；"720p" 等把整張幀縮小到指定的高度；
+# "target 64" 等依目標大小決定，縮小到追蹤框的短邊約為指定的像素數（只縮小，不放大）
+RESOLUTION_FULL = "full"
+TRACKING_RESOLUTIONS = [RESOLUTION_FULL, "1080p", "720p", "480p", "target 128", "target 64"]
+
+
+# 依序在 cv2 與 cv2.legacy 中尋找建立函式（不同的 OpenCV 版本 / 是否安裝 contrib 放的位置不同）
+def _find_factory(name):
+    for module in (cv2, getattr(cv2, "legacy", None)):
+        if module is not None and hasattr(module, name):
+            return getattr(module, name)
+    return None
+
+
+def _create_classic(factory_name):
+    def create():
+        factory = _find_factory(factory_name)
+        if factory is None:
+            raise ValueError(f"{factory_name} is not available in this OpenCV build")
+        return factory()
+    return create
+
+
+def _check_models(*paths):
+    missing = [path for path in paths if not os.path.exists(path)]
+    if missing:
+        raise ValueError(f"missing tracker model: {', '.join(missing)}")
+
+
+def _create_nano():
+    _check_models(NANO_BACKBONE, NANO_NECKHEAD)
+    params = cv2.TrackerNano_Params()
+    params.backbone = NANO_BACKBONE
+    params.neckhead = NANO_NECKHEAD
+    return cv2.TrackerNano_create(params)
+
+
+def _create_dasiamrpn():
+    _check_models(DASIAMRPN_MODEL, DASIAMRPN_KERNEL_CLS1, DASIAMRPN_KERNEL_R1)
+    params = cv2.TrackerDaSiamRPN_Params()
+    params.model = DASIAMRPN_MODEL
+    params.kernel_cls1 = DASIAMRPN_KERNEL_CLS1
+    params.kernel_r1 = DASIAMRPN_KERNEL_R1
+    return cv2.TrackerDaSiamRPN_create(params)
+
+
+def _create_vit():
+    _check_models(VIT_MODEL)
+    params = cv2.TrackerVit_Params()
+    params.net = VIT_MODEL
+    return cv2.TrackerVit_create(params)
+
+
+# 名稱 -> (建立函式, 需要的 OpenCV 建立函式名稱)
+TRACKER_FACTORIES = {
+    TRACKER_CSRT: (_create_classic("TrackerCSRT_create"), "TrackerCSRT_create"),
+    TRACKER_KCF: (_create_classic("TrackerKCF_create"), "TrackerKCF_create"),
+    TRACKER_MOSSE: (_create_classic("TrackerMOSSE_create"), "TrackerMOSSE_create"),
+    TRACKER_MIL: (_create_classic("TrackerMIL_create"), "TrackerMIL_create"),
+    TRACKER_NANO: (_create_nano, "TrackerNano_create"),
+    TRACKER_DASIAMRPN: (_create_dasiamrpn, "TrackerDaSiamRPN_create"),
+    TRACKER_VIT: (_create_vit, "TrackerVit_create"),
+}
+
+
+# 這個 OpenCV 版本有提供的追蹤器名稱（DNN 追蹤器另外還需要 models 目錄中的模型檔）
+def available_trackers():
+    return [name for name, (_, factory_name) in TRACKER_FACTORIES.items() if _find_factory(factory_name) is not None]
+
+
+# 依追蹤解析度的設定，計算大小為 frame_size (寬, 高)、追蹤框為 bbox 時的縮小比例
+def tracking_scale(frame_size, bbox, resolution):
+    if not resolution or resolution == RESOLUTION_FULL:
+        return 1.0
+    if resolution.endswith("p"):
+        return min(1.0, int(resolution[:-1]) / frame_size[1])
+    if resolution.startswith("target"):
+        return min(1.0, int(resolution.split()[1]) / max(min(bbox[2], bbox[3]), 1))
+    raise ValueError(f"unknown tracking resolution: {resolution}")
+
+
+# 在縮小的幀上執行追蹤器，回傳的追蹤框換算回原始幀的座標（畫框、放大畫面、匯出都使用原始座標）
+# 縮放比例在 init 時依追蹤解析度決定，之後固定；縮小的幀寫入重複使用的緩衝區
+class ScaledTracker:
+    def __init__(self, tracker, resolution):
+        self.tracker = tracker
+        self.resolution = resolution
+        self.scale = 1.0
+        self._buffer = None
+
+    def _downscale(self, frame):
+        if self.scale == 1.0:
+            return frame
+        size = (max(1, round(frame.shape[1] * self.scale)), max(1, round(frame.shape[0] * self.scale)))
+        if self._buffer is None or self._buffer.shape[:2] != (size[1], size[0]):
+            self._buffer = np.empty((size[1], size[0]) + frame.shape[2:], dtype=frame.dtype)
+        return cv2.resize(frame, size, dst=self._buffer, interpolation=cv2.INTER_AREA)
+
+    def init(self, frame, bbox):
+        self.scale = tracking_scale((frame.shape[1], frame.shape[0]), bbox, self.resolution)
+        self.tracker.init(self._downscale(frame), tuple(int(round(v * self.scale)) for v in bbox))
+
+    def update(self, frame):
+        success, bbox = self.tracker.update(self._downscale(frame))
+        if success and self.scale != 1.0:
+            bbox = tuple(v / self.scale for v in bbox)
+        return success, bbox
+
+
+# 包裝 OpenCV 追蹤器，介面與 cv2.Tracker 相同，另外記錄每一幀 update 的時間
+class TimedTracker:
+    def __init__(self, name, tracker):
+        self.name = name
+        self.tracker = tracker
+        self.frames = 0  # update 的次數
+        self.lost = 0  # update 失敗（追丟）的次數
+        self.total_time = 0.0  # 累計的 update 時間（秒）
+        self.last_time = 0.0  # 上一次 update 的時間（秒）
+
+    def init(self, frame, bbox):
+        # 新版的追蹤器只接受整數座標
+        self.tracker.init(frame, tuple(int(v) for v in bbox))
+
+    def update(self, frame):
+        start = time.perf_counter()
+        success, bbox = self.tracker.update(frame)
+        self.last_time = time.perf_counter() - start
+        self.total_time += self.last_time
+        self.frames += 1
+        if not success:
+            self.lost += 1
+        return success, bbox
+
+    def stats(self):
+        return {
+            "tracker": self.name,
+            "scale": round(getattr(self.tracker, "scale", 1.0), 3),
+            "frames": self.frames,
+            "lost": self.lost,
+            "avg_ms": round(self.total_time / self.frames * 1000, 3) if self.frames else 0.0,
+            "last_ms": round(self.last_time * 1000, 3),
+        }
+
+
+# 建立指定名稱的追蹤器；name 為 None 時使用 DEFAULT_TRACKER，resolution 為追蹤解析度（None 表示原始解析度）
+# 指定的追蹤器無法使用（OpenCV 沒有提供、缺少模型檔）時改用第一個可以使用的傳統追蹤器
+def create_tracker(name=None, resolution=None):
+    name = name or DEFAULT_TRACKER
+    if name not in TRACKER_FACTORIES:
+        raise ValueError(f"unknown tracker: {name}")
+    try:
+        tracker = TRACKER_FACTORIES[name][0]()
+    except (ValueError, cv2.error) as e:
+        for fallback in (TRACKER_CSRT, TRACKER_KCF, TRACKER_MIL):
+            if fallback != name and _find_factory(TRACKER_FACTORIES[fallback][1]) is not None:
+                print(f"Tracker '{name}' unavailable ({e}), falling back to {fallback}")
+                name = fallback
+                tracker = TRACKER_FACTORIES[fallback][0]()
+                break
+        else:
+            raise
+    if resolution and resolution != RESOLUTION_FULL:
+        tracker = ScaledTracker(tracker, resolution)
+    return TimedTracker(name, tracker)
@@ -0,0 +1,105 @@
+# tracking_worker.py
+# 背景追蹤執行緒：從解碼流程接收幀，在 GUI 執行緒之外更新追蹤器，並發布帶有幀號的追蹤結果
+# 畫面只需要取出與目前顯示的幀對應（或最接近之前）的結果來畫，追蹤器跟不上時播放速度不受影響，
+# 顯示的幀號與結果的幀號相差多少就是目前的追蹤延遲
+import threading
+from collections import OrderedDict, deque
+
+
+# 一幀的追蹤結果：幀號、追蹤成功的 [(目標編號, bbox), ...]，以及目標編號 -> 平滑過的框（放大畫面使用，追丟的目標為預測的位置）
+class TrackingResult:
+    __slots__ = ("index", "boxes", "smoothed")
+
+    def __init__(self, index, boxes, smoothed=None):
+        self.index = index
+        self.boxes = boxes
+        self.smoothed = smoothed or {}
+
+
+class TrackingWorker(threading.Thread):
+    def __init__(self, trackers, depth=8, history=120):
+        super().__init__(daemon=True)
+        self.trackers = trackers  # multi_tracker.MultiTracker
+        self.store = None  # track_store.TrackStoreWriter，設定後每一幀的追蹤結果都會寫入 .tracks 檔
+        self.history = history  # 保留最近幾幀的結果
+        self.skipped = 0  # 追蹤器跟不上、還沒處理就被擠掉的幀數
+        self.latest = None  # 最新的追蹤結果
+        self._frames = deque(maxlen=depth)  # 等待追蹤的 (幀號, 影像)，滿了時最舊的會被擠掉
+        self._results = OrderedDict()  # 幀號 -> TrackingResult
+        self._generation = 0  # 每次 reset 就加一，reset 之前開始追蹤的幀的結果會被丟棄
+        self._start_index = 0  # 幀號比這個小的幀不追蹤（追蹤器初始化用的幀與之前的幀）
+        self._cond = threading.Condition()
+        self._stopped = False
+
+    # 由解碼執行緒呼叫，放入一個新解碼的幀，不會等待
+    def submit(self, frame_index, frame):
+        with self._cond:
+            if len(self._frames) == self._frames.maxlen:
+                self.skipped += 1
+            self._frames.append((frame_index, frame))
+            self._cond.notify()
+
+    # 取得要和 frame_index 一起顯示的結果：有這一幀的結果就用它，否則使用在它之前最新的結果；都沒有時回傳 None
+    def result_for(self, frame_index):
+        with self._cond:
+            result = self._results.get(frame_index)
+            if result is not None:
+                return result
+            for index in reversed(self._results):
+                if index <= frame_index:
+                    return self._results[index]
+        return None
+
+    # 追蹤器以 frame_index 這一幀初始化完成後，從下一幀開始追蹤
+    def start_from(self, frame_index):
+        self._start_index = frame_index + 1
+        if not self.is_alive():
+            self.start()
+
+    # 跳轉之後舊位置的幀與結果都不再有意義
+    def reset(self):
+        with self._cond:
+            self._frames.clear()
+            self._results.clear()
+            self._generation += 1
+            self._start_index = 0
+            self.latest = None
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._frames.clear()
+            self._cond.notify()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout=1.0)
+
+    def run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._frames or self._stopped)
+                if self._stopped:
+                    return
+                frame_index, frame = self._frames.popleft()
+                generation = self._generation
+            if frame_index < self._start_index or not self.trackers:
+                continue
+            results = self.trackers.update(frame)
+            store = self.store
+            if store is not None:
+                store.append(frame_index, results, self.trackers.targets)
+            boxes = [(target_id, bbox) for target_id, success, bbox in results if success]
+            # 有運動模型的追蹤器（loss_recovery.RecoveringTracker）另外提供平滑過的框，沒有時使用原本的框；
+            # 追丟的目標只有運動模型預測的框
+            smoothed = {}
+            for target_id, success, bbox in results:
+                smoothed_bbox = getattr(self.trackers.targets.get(target_id), "smoothed_bbox", None)
+                if success or smoothed_bbox is not None:
+                    smoothed[target_id] = smoothed_bbox or bbox
+            result = TrackingResult(frame_index, boxes, smoothed)
+            with self._cond:
+                if generation != self._generation:
+                    continue
+                self._results[frame_index] = result
+                while len(self._results) > self.history:
+                    self._results.popitem(last=False)
+                self.latest = result
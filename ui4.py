@@ -1,5 +1,7 @@
-from PyQt5.QtWidgets import QLabel, QPushButton, QSlider, QVBoxLayout, QHBoxLayout, QWidget, QSizePolicy
+from PyQt5.QtWidgets import QLabel, QPushButton, QSlider, QVBoxLayout, QHBoxLayout, QWidget, QComboBox, QCheckBox
 from PyQt5.QtCore import Qt
+from video_surface import VideoSurface  # 直接在 paintEvent 中繪製影像與追蹤框的顯示元件
+from tracker_registry import available_trackers, DEFAULT_TRACKER, TRACKING_RESOLUTIONS  # 可選擇的追蹤演算法與追蹤解析度
 
 class VideoPlayerUI(QWidget):
     def __init__(self):
@@ -10,14 +12,9 @@ class VideoPlayerUI(QWidget):
         # 創建一個水平佈局來管理控制按鈕和滑動條
         self.controls_layout = QHBoxLayout()
 
-        # 創建用於顯示視頻的 QLabel
-        self.video_label = QLabel()
-        self.video_label.setAlignment(Qt.AlignCenter)
-        # 設置 video_label 的背景色為黑色
-        self.video_label.setStyleSheet("background-color: black;")
-        # 設置 sizePolicy 使 QLabel 能夠擴展填充剩餘空間
-        self.video_label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-        self.main_layout.addWidget(self.video_label)
+        # 創建用於顯示視頻的 VideoSurface（黑色背景、影像置中，會擴展填充剩餘空間）
+        self.video_surface = VideoSurface()
+        self.main_layout.addWidget(self.video_surface)
         
         # 創建控制按鈕和滑動條
         self.play_button = QPushButton("Play")
@@ -27,15 +24,34 @@ class VideoPlayerUI(QWidget):
         self.open_file_button = QPushButton("Open File")
         self.progress_slider = QSlider(Qt.Horizontal)
         self.time_label = QLabel("00:00 / 00:00")
+        # 追蹤延遲：顯示中的幀與畫在上面的追蹤結果相差幾幀
+        self.tracking_label = QLabel("")
+        # 選擇下一個開啟的檔案要使用的解碼器後端（auto 依副檔名決定）
+        self.decoder_combo = QComboBox()
+        self.decoder_combo.addItems(["auto", "opencv", "pyav", "ffmpeg"])
+        # 選擇下一個圈選的 ROI 要使用的追蹤演算法
+        self.tracker_combo = QComboBox()
+        self.tracker_combo.addItems(available_trackers())
+        self.tracker_combo.setCurrentText(DEFAULT_TRACKER)
+        # 追蹤器使用的解析度（縮小後追蹤，追蹤框仍是原始座標）
+        self.resolution_combo = QComboBox()
+        self.resolution_combo.addItems(TRACKING_RESOLUTIONS)
+        # 偵測加追蹤的混合模式：每隔幾幀用 YOLOv4-tiny 偵測並修正追蹤框
+        self.detect_check = QCheckBox("Detect")
 
         # 將控件添加到控制佈局中
         self.controls_layout.addWidget(self.open_file_button)
+        self.controls_layout.addWidget(self.decoder_combo)
+        self.controls_layout.addWidget(self.tracker_combo)
+        self.controls_layout.addWidget(self.resolution_combo)
+        self.controls_layout.addWidget(self.detect_check)
         self.controls_layout.addWidget(self.play_button)
         self.controls_layout.addWidget(self.pause_button)
         self.controls_layout.addWidget(self.reset_button)
         self.controls_layout.addWidget(self.clear_button)
         self.controls_layout.addWidget(self.progress_slider)
         self.controls_layout.addWidget(self.time_label)
+        self.controls_layout.addWidget(self.tracking_label)
 
         # 創建控制佈局的容器
         self.controls_frame = QWidget()
@@ -52,14 +68,13 @@ class VideoPlayerUI(QWidget):
         # 調整邊距
         # 設置 main_layout 內部內容與視窗邊緣之間的邊距 (margins)，setContentsMargins 設定佈局內容與左、上、右、下邊界之間的距離
         self.main_layout.setContentsMargins(0, 0, 0, 0)
-        # 設置 main_layout 內部元素（video_label 和 controls_frame）之間的間距 (spacing)
+        # 設置 main_layout 內部元素（video_surface 和 controls_frame）之間的間距 (spacing)
         self.main_layout.setSpacing(0)
 
         # 創建放大視窗
         self.zoom_window = QWidget(self)
         self.zoom_window.setWindowTitle("Zoomed View")
         self.widget = QWidget(self.zoom_window)
-        self.zoom_label = QLabel(self.widget)
-        self.zoom_label.setAlignment(Qt.AlignCenter)
+        self.zoom_label = VideoSurface(self.widget)
         self.zoom_window_layout = QVBoxLayout(self.zoom_window)
         self.zoom_window_layout.addWidget(self.widget)
\ No newline at end of file
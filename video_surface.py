@@ -0,0 +1,114 @@
+# video_surface.py
+# 顯示影片的 QWidget：在 paintEvent 中把目前的幀（QImage）直接畫到預先算好的目標區域
+# 圈選框和追蹤框是另外一層覆蓋圖層，只在繪製時畫在畫面上，圈選 ROI、畫追蹤框都不需要複製整張影像
+from PyQt5.QtCore import Qt, QPointF, QRect, QRectF
+from PyQt5.QtGui import QPainter, QPen
+from PyQt5.QtWidgets import QWidget, QSizePolicy
+
+from qt_display import DisplayPath, fit_into
+
+
+class VideoSurface(QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setAttribute(Qt.WA_OpaquePaintEvent)  # 整個區域都由 paintEvent 自己畫，不需要先清除背景
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.display_path = DisplayPath()  # 把 BGR 陣列轉成 QImage（保留陣列參考，統計複製次數）
+        self.image = None  # 目前顯示的 QImage
+        self.frame_size = None  # 目前這一幀的原始大小 (寬, 高)，追蹤框使用這個座標
+        self.target_rect = QRect()  # 影像在元件中的位置（置中、等比例），只在幀大小或元件大小改變時重新計算
+        self.boxes = []  # 追蹤框 (x, y, w, h)，原始幀的座標
+        self.detections = []  # 偵測結果（detector.Detection），畫出偵測框與類別名稱
+        self.selection = None  # 正在拖動的圈選框 QRect，元件的座標
+        self.selections = []  # 已經圈選完成、還沒開始追蹤的 ROI（QRect，元件的座標）
+        self.box_pen = QPen(Qt.blue, 2)
+        self.detection_pen = QPen(Qt.green, 2)
+        self.selection_pen = QPen(Qt.red)
+
+    # 顯示一個 BGR 幀，boxes 為要畫在上面的追蹤框、detections 為偵測結果（都是原始幀的座標）
+    # 幀是以顯示大小解碼（或是縮圖）時，source_size 為影片的原始大小 (寬, 高)，追蹤框和偵測框依照它換算
+    def show_frame(self, frame, boxes=(), detections=(), source_size=None):
+        self.image = self.display_path.to_qimage(frame, (self.width(), self.height()))
+        frame_size = tuple(source_size) if source_size else (frame.shape[1], frame.shape[0])
+        if frame_size != self.frame_size:
+            self.frame_size = frame_size
+            self.update_target_rect()
+        self.boxes = list(boxes)
+        self.detections = list(detections)
+        self.update()
+
+    # 設定圈選框（None 表示清除），只重畫覆蓋圖層，不需要重新處理影像
+    def set_selection(self, rect):
+        self.selection = rect
+        self.update()
+
+    # 加入一個圈選完成的 ROI（開始追蹤前都會顯示）
+    def add_selection(self, rect):
+        self.selections.append(rect)
+        self.selection = None
+        self.update()
+
+    def clear_selections(self):
+        self.selections = []
+        self.selection = None
+        self.update()
+
+    def clear(self):
+        self.image = None
+        self.frame_size = None
+        self.boxes = []
+        self.detections = []
+        self.selection = None
+        self.selections = []
+        self.update()
+
+    def update_target_rect(self):
+        if not self.frame_size:
+            self.target_rect = QRect()
+            return
+        width, height = fit_into(self.frame_size, (max(self.width(), 1), max(self.height(), 1)))
+        self.target_rect = QRect((self.width() - width) // 2, (self.height() - height) // 2, width, height)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.update_target_rect()
+
+    # 把元件座標的矩形 (x, y, w, h) 換算成大小為 frame_size (寬, 高) 的幀的座標，超出畫面的部分會被裁掉
+    def map_to_frame(self, rect, frame_size):
+        if self.target_rect.isEmpty():
+            return None
+        scale_x = frame_size[0] / self.target_rect.width()
+        scale_y = frame_size[1] / self.target_rect.height()
+        x1 = min(max(int((rect[0] - self.target_rect.x()) * scale_x), 0), frame_size[0])
+        y1 = min(max(int((rect[1] - self.target_rect.y()) * scale_y), 0), frame_size[1])
+        x2 = min(max(int((rect[0] + rect[2] - self.target_rect.x()) * scale_x), 0), frame_size[0])
+        y2 = min(max(int((rect[1] + rect[3] - self.target_rect.y()) * scale_y), 0), frame_size[1])
+        return x1, y1, x2 - x1, y2 - y1
+
+    # 把原始幀座標的 (x, y, w, h) 換算成元件座標的 QRectF
+    def map_from_frame(self, bbox):
+        scale_x = self.target_rect.width() / self.frame_size[0]
+        scale_y = self.target_rect.height() / self.frame_size[1]
+        return QRectF(self.target_rect.x() + bbox[0] * scale_x, self.target_rect.y() + bbox[1] * scale_y,
+                      bbox[2] * scale_x, bbox[3] * scale_y)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.black)
+        if self.image is not None:
+            # 影像大小通常已經等於目標區域（DisplayPath 已經縮放好），這裡只是直接貼上
+            painter.drawImage(self.target_rect, self.image)
+            painter.setPen(self.box_pen)
+            for bbox in self.boxes:
+                painter.drawRect(self.map_from_frame(bbox))
+            painter.setPen(self.detection_pen)
+            for detection in self.detections:
+                rect = self.map_from_frame(detection.box)
+                painter.drawRect(rect)
+                painter.drawText(rect.topLeft() + QPointF(2, -4), f"{detection.label} {detection.confidence:.2f}")
+        painter.setPen(self.selection_pen)
+        for rect in self.selections:
+            painter.drawRect(rect)
+        if self.selection is not None:
+            painter.drawRect(self.selection)
+        painter.end()
@@ -0,0 +1,66 @@
+# zoom_renderer.py
+# 放大視窗的繪製：把追蹤框對應到放大畫面的仿射變換一次算好，用一次 cv2.warpAffine 完成裁切與縮放，
+# 直接寫入重複使用的緩衝區；追蹤框超出畫面的部分以補邊顏色填滿，不會產生空的切片
+import time
+
+import cv2
+import numpy as np
+
+# 可選擇的插值方式（warpAffine 不支援 INTER_AREA）
+INTERPOLATIONS = {
+    "nearest": cv2.INTER_NEAREST,
+    "linear": cv2.INTER_LINEAR,
+    "cubic": cv2.INTER_CUBIC,
+    "lanczos": cv2.INTER_LANCZOS4,
+}
+
+
+class ZoomRenderer:
+    def __init__(self, background=0, interpolation="linear"):
+        self.background = background  # 補邊的顏色（0 黑色 / 255 白色）
+        self.interpolation = interpolation
+        self.frames = 0  # 已繪製的幀數
+        self.total_time = 0.0  # 累計的繪製時間（秒）
+        self.last_time = 0.0  # 上一幀的繪製時間（秒）
+        self._buffer = None  # 輸出緩衝區（放大畫面大小）
+        self._region = None  # 上一次影像所在的區域 (x, y, w, h)，改變時才重新填補邊
+
+    # 把 frame 中 bbox (x, y, w, h) 的範圍等比例放大、置中放進 out_size (寬, 高)，回傳輸出緩衝區
+    def render(self, frame, bbox, out_size):
+        start = time.perf_counter()
+        out_width, out_height = max(int(out_size[0]), 1), max(int(out_size[1]), 1)
+        if self._buffer is None or self._buffer.shape[:2] != (out_height, out_width):
+            self._buffer = np.empty((out_height, out_width, 3), dtype=np.uint8)
+            self._region = None
+        x, y, w, h = (float(v) for v in bbox)
+        if w <= 0 or h <= 0:
+            self._buffer[:] = self.background
+            self._region = None
+            return self._buffer
+        scale = min(out_width / w, out_height / h)
+        width, height = max(1, int(w * scale)), max(1, int(h * scale))
+        region = ((out_width - width) // 2, (out_height - height) // 2, width, height)
+        if region != self._region:
+            # 影像所在的區域改變時才重新填滿補邊
+            self._buffer[:] = self.background
+            self._region = region
+        # 仿射矩陣：原始幀座標 -> 輸出區域座標（裁切、縮放一次完成），與 cv2.resize 一樣以像素中心對齊
+        matrix = np.array([[scale, 0.0, (0.5 - x) * scale - 0.5], [0.0, scale, (0.5 - y) * scale - 0.5]])
+        target = self._buffer[region[1]:region[1] + height, region[0]:region[0] + width]
+        cv2.warpAffine(frame, matrix, (width, height), dst=target, flags=INTERPOLATIONS[self.interpolation],
+                       borderMode=cv2.BORDER_CONSTANT, borderValue=(self.background,) * 3)
+        self._count(time.perf_counter() - start)
+        return self._buffer
+
+    def _count(self, elapsed):
+        self.frames += 1
+        self.last_time = elapsed
+        self.total_time += elapsed
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "interpolation": self.interpolation,
+            "avg_ms": round(self.total_time / self.frames * 1000, 3) if self.frames else 0.0,
+            "last_ms": round(self.last_time * 1000, 3),
+        }